@@ -0,0 +1,91 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+The Streamlit app keeps its DB helpers and its UI in one script, so the
+benchmarks load only the part above the "Streamlit UI" section. Backend
+modules have spaces in their file names and are loaded by path.
+
+st.cache_resource keys its caches on the function's module, name and
+source, so every loaded copy shares one pool, catalog cache and query
+stats. load_frontend() clears them, so each copy opens its own database.
+"""
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import time
+import types
+
+import streamlit as st
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+FRONTEND = os.path.join(ROOT, "ft", "frontend.py")
+BT = os.path.join(ROOT, "bt")
+UI_MARKER = "# Streamlit UI\n"
+CACHED_FUNC = type(st.cache_resource(lambda: None))
+
+
+def load_frontend(db_path):
+    """Return the frontend helpers as a module bound to ``db_path``."""
+    with open(FRONTEND, encoding="utf-8") as f:
+        src = f.read()
+    helpers = src.split(UI_MARKER, 1)[0]
+    mod = types.ModuleType("frontend_helpers")
+    mod.__file__ = FRONTEND
+    exec(compile(helpers, FRONTEND, "exec"), mod.__dict__)
+    mod.DB_PATH = db_path
+    # Drop resources a previous copy created for another DB_PATH
+    for value in list(vars(mod).values()):
+        if isinstance(value, CACHED_FUNC):
+            value.clear()
+    return mod
+
+
+def load_module(filename, name):
+    """Import ``bt/<filename>`` under ``name``."""
+    if BT not in sys.path:
+        sys.path.insert(0, BT)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(BT, filename))
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[name] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def temp_db(prefix="bench"):
+    fd, path = tempfile.mkstemp(prefix=prefix + "_", suffix=".db")
+    os.close(fd)
+    os.remove(path)
+    return path
+
+
+def remove_db(path):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "mean": statistics.fmean(samples) if samples else 0.0,
+        "p50": percentile(samples, 50),
+        "p99": percentile(samples, 99),
+    }
@@ -0,0 +1,76 @@
+"""Login latency in the Flask auth API as concurrency grows.
+
+Runs the same login storm with hashing inline (HASH_WORKERS=0) and on the
+process pool, and reports p50/p99 per request.
+
+    python bench/bench_auth.py --concurrency 1 4 16 64 --requests 400
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from _common import load_module, summarize
+
+N_USERS = 16
+
+
+def storm(api, concurrency, n_requests):
+    per_thread = max(1, n_requests // concurrency)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(tid):
+        client = api.app.test_client()
+        mine = []
+        for i in range(per_thread):
+            email = f"user{(tid + i) % N_USERS}@example.com"
+            start = time.perf_counter()
+            resp = client.post("/api/login", json={"email": email, "password": "correct horse"})
+            mine.append(time.perf_counter() - start)
+            with lock:
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return summarize(latencies), len(latencies) / elapsed, statuses
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    # Keep the API's image store out of the working directory
+    os.environ.setdefault("IMAGE_FOLDER", tempfile.mkdtemp(prefix="bench_auth_images_"))
+    api = load_module("user 1.py", "auth_api")
+    client = api.app.test_client()
+    for i in range(N_USERS):
+        client.post("/api/register", json={"email": f"user{i}@example.com",
+                                           "username": f"user{i}",
+                                           "password": "correct horse"})
+
+    print(f"{'mode':>8} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}  statuses")
+    for mode, workers in (("inline", 0), ("pool", args.workers)):
+        api.hash_pool.shutdown()
+        api.hash_pool.workers = workers
+        for concurrency in args.concurrency:
+            stats, rps, statuses = storm(api, concurrency, args.requests)
+            print(f"{mode:>8} {concurrency:>5} {rps:>8.1f} {stats['p50'] * 1000:>8.1f} "
+                  f"{stats['p99'] * 1000:>8.1f}  {statuses}")
+    api.hash_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""SQLiteDB bulk writes vs the row-at-a-time methods.
+
+Each case runs against a fresh on-disk database, so per-row commits pay
+their real fsync cost.
+
+    python bench/bench_bulk.py --rows 5000 --chunk-size 1000
+"""
+import argparse
+import time
+
+from _common import load_module, remove_db, temp_db
+
+
+def rows_for(n):
+    users = [(f"user{i}@example.com", f"user{i}", "hash") for i in range(n)]
+    products = [("user0@example.com", f"Item {i}", "desc", "Books", float(i % 500), "img.png")
+                for i in range(n)]
+    cart = [(f"user{i % 100}@example.com", i % n + 1, 1 + i % 3) for i in range(n)]
+    purchases = [(f"user{i % 100}@example.com", i % n + 1) for i in range(n)]
+    return users, products, cart, purchases
+
+
+def single(db, users, products, cart, purchases):
+    timings = {}
+    start = time.perf_counter()
+    for row in users:
+        db.add_user(*row)
+    timings["users"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for row in products:
+        db.add_product(*row)
+    timings["products"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for row in cart:
+        db.add_to_cart(*row)
+    timings["cart"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for row in purchases:
+        db.record_purchase(*row)
+    timings["purchases"] = time.perf_counter() - start
+    return timings
+
+
+def bulk(db, users, products, cart, purchases, chunk_size):
+    timings = {}
+    start = time.perf_counter()
+    db.add_users_many(users, chunk_size=chunk_size)
+    timings["users"] = time.perf_counter() - start
+    start = time.perf_counter()
+    db.add_products_many(products, chunk_size=chunk_size)
+    timings["products"] = time.perf_counter() - start
+    start = time.perf_counter()
+    db.add_to_cart_many(cart, chunk_size=chunk_size)
+    timings["cart"] = time.perf_counter() - start
+    start = time.perf_counter()
+    db.record_purchases_many(purchases, chunk_size=chunk_size)
+    timings["purchases"] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--chunk-size", type=int, default=1000)
+    args = ap.parse_args()
+
+    storage = load_module("memorystorage.py", "memorystorage")
+    data = rows_for(args.rows)
+    results = {}
+    for mode in ("single", "bulk"):
+        path = temp_db("bench_bulk")
+        try:
+            db = storage.SQLiteDB(path)
+            if mode == "single":
+                results[mode] = single(db, *data)
+            else:
+                results[mode] = bulk(db, *data, chunk_size=args.chunk_size)
+            db.close()
+        finally:
+            remove_db(path)
+
+    print(f"{args.rows} rows per table, chunk size {args.chunk_size}")
+    print(f"{'table':>10} {'single rows/s':>14} {'bulk rows/s':>12} {'speedup':>8}")
+    for table in results["single"]:
+        one = args.rows / results["single"][table]
+        many = args.rows / results["bulk"][table]
+        print(f"{table:>10} {one:>14.0f} {many:>12.0f} {many / one:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Cart store micro-benchmark: list-based carts vs the product_id -> quantity map.
+
+For each cart size, times filling the cart, re-adding every item, viewing it
+with totals, and removing every item.
+
+    python bench/bench_cart.py --sizes 1 10 100 1000 10000
+"""
+import argparse
+import time
+
+from _common import load_module
+
+
+class ListCart:
+    # The old cart.py store: a list of product ids per user.
+    def __init__(self, get_product):
+        self.get_product = get_product
+        self.carts = {}
+
+    def add_to_cart(self, user_email, product_id):
+        if self.get_product(product_id) is None:
+            return False
+        cart = self.carts.setdefault(user_email, [])
+        if product_id not in cart:
+            cart.append(product_id)
+            return True
+        return False
+
+    def remove_from_cart(self, user_email, product_id):
+        cart = self.carts.get(user_email)
+        if not cart or product_id not in cart:
+            return False
+        cart.remove(product_id)
+        return True
+
+    def view_with_totals(self, user_email):
+        items = [self.get_product(pid) for pid in self.carts.get(user_email, [])
+                 if self.get_product(pid) is not None]
+        return items, len(items), sum(p.price for p in items)
+
+
+def run_ops(add, remove, view, n):
+    timings = {}
+    start = time.perf_counter()
+    for pid in range(1, n + 1):
+        add("bench@example.com", pid)
+    timings["add"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for pid in range(1, n + 1):
+        add("bench@example.com", pid)
+    timings["re-add"] = time.perf_counter() - start
+    start = time.perf_counter()
+    view("bench@example.com")
+    timings["view"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for pid in range(1, n + 1):
+        remove("bench@example.com", pid)
+    timings["remove"] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    args = ap.parse_args()
+
+    products = load_module("products.py", "products")
+    cart = load_module("cart.py", "cart")
+    for i in range(max(args.sizes)):
+        products.create_product(f"Item {i}", "", products.categories[i % 5], float(i % 90 + 1),
+                                "seller@example.com")
+
+    print(f"{'items':>6} {'store':>5} " + " ".join(f"{op + ' ms':>10}" for op in
+                                                 ("add", "re-add", "view", "remove")))
+    for n in args.sizes:
+        legacy = ListCart(products.get_product)
+        rows = [
+            ("list", run_ops(legacy.add_to_cart, legacy.remove_from_cart,
+                             legacy.view_with_totals, n)),
+            ("map", run_ops(cart.add_to_cart, cart.remove_from_cart,
+                            cart.view_cart_with_totals, n)),
+        ]
+        for store, timings in rows:
+            print(f"{n:>6} {store:>5} " + " ".join(f"{t * 1000:>10.3f}" for t in timings.values()))
+
+
+if __name__ == "__main__":
+    main()
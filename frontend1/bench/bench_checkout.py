@@ -0,0 +1,74 @@
+"""Orders per second through frontend.checkout() by cart size and concurrent sessions.
+
+Carts are filled before the clock starts, so only checkout() is timed.
+
+    python bench/bench_checkout.py --cart-sizes 1 5 20 50 --sessions 1 4 8
+"""
+import argparse
+import threading
+import time
+
+from _common import load_frontend, remove_db, temp_db
+
+N_PRODUCTS = 1000
+
+
+def setup(fe, n_users, cart_size):
+    fe.init_db()
+    with fe.transaction() as conn:
+        conn.executemany("INSERT INTO users(email,password_hash,username) VALUES(?,?,?)",
+                         [(f"u{i}@example.com", "x", f"u{i}") for i in range(n_users)])
+        conn.executemany(
+            """INSERT INTO products(user_id,title,description,category,price,image,created_at)
+               VALUES(1,?,'','Books',?,'placeholder.jpg','2024-01-01T00:00:00')""",
+            [(f"Item {i}", float(i % 300 + 1)) for i in range(N_PRODUCTS)])
+        conn.executemany("INSERT INTO cart(user_id,product_id,quantity) VALUES(?,?,1)",
+                         [(uid, (uid * 31 + k) % N_PRODUCTS + 1)
+                          for uid in range(1, n_users + 1) for k in range(cart_size)])
+
+
+def measure(cart_size, sessions, orders_per_session):
+    db_path = temp_db("bench_checkout")
+    fe = load_frontend(db_path)
+    try:
+        setup(fe, sessions * orders_per_session, cart_size)
+        errors = []
+
+        def worker(first_uid):
+            for uid in range(first_uid, first_uid + orders_per_session):
+                ok, msg = fe.checkout(uid)
+                if not ok:
+                    errors.append(msg)
+
+        threads = [threading.Thread(target=worker, args=(1 + s * orders_per_session,))
+                   for s in range(sessions)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        if errors:
+            raise RuntimeError(f"{len(errors)} checkouts failed: {errors[0]}")
+        return sessions * orders_per_session / elapsed
+    finally:
+        fe.get_pool().close()
+        remove_db(db_path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--cart-sizes", type=int, nargs="+", default=[1, 5, 20, 50])
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--orders", type=int, default=200, help="orders per session")
+    args = ap.parse_args()
+
+    print(f"{'cart size':>9} {'sessions':>8} {'orders/s':>10}")
+    for cart_size in args.cart_sizes:
+        for sessions in args.sessions:
+            ops = measure(cart_size, sessions, args.orders)
+            print(f"{cart_size:>9} {sessions:>8} {ops:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
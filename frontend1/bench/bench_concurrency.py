@@ -0,0 +1,104 @@
+"""SQLiteDB read and write throughput as the number of caller threads grows.
+
+Compares the reader-pool / writer-thread SQLiteDB with the old model of
+one shared connection behind a lock, committing every write. Writes per
+commit shows how much group commit is batching.
+
+    python bench/bench_concurrency.py --threads 1 2 4 8 16 --ops 2000
+"""
+import argparse
+import random
+import sqlite3
+import threading
+import time
+
+from _common import load_module, remove_db, temp_db
+
+N_PRODUCTS = 10_000
+
+
+class LockedDB:
+    # The old SQLiteDB shared between threads: one connection, one lock.
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    def get_product(self, pid):
+        with self.lock:
+            return self.conn.execute("SELECT * FROM products WHERE id = ?", (pid,)).fetchone()
+
+    def add_to_cart(self, user_email, product_id, quantity=1):
+        with self.lock:
+            self.conn.execute('''INSERT INTO carts (user_email, product_id, quantity)
+                                 VALUES (?, ?, ?)
+                                 ON CONFLICT(user_email, product_id) DO UPDATE SET quantity=quantity+?''',
+                              (user_email, product_id, quantity, quantity))
+            self.conn.commit()
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        self.conn.close()
+
+
+def run_threads(n_threads, ops, work):
+    threads = [threading.Thread(target=work, args=(t, ops // n_threads)) for t in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return (ops // n_threads) * n_threads / (time.perf_counter() - start)
+
+
+def measure(db, n_threads, ops):
+    def reader(tid, n):
+        rng = random.Random(tid)
+        for _ in range(n):
+            db.get_product(rng.randint(1, N_PRODUCTS))
+
+    def writer(tid, n):
+        rng = random.Random(tid)
+        for _ in range(n):
+            db.add_to_cart(f"user{tid}@example.com", rng.randint(1, N_PRODUCTS))
+
+    reads = run_threads(n_threads, ops, reader)
+    before = db.stats().get("commits")
+    writes = run_threads(n_threads, ops, writer)
+    per_commit = None
+    if before is not None:
+        per_commit = (ops // n_threads) * n_threads / max(1, db.stats()["commits"] - before)
+    return reads, writes, per_commit
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    ap.add_argument("--ops", type=int, default=2000)
+    args = ap.parse_args()
+
+    storage = load_module("memorystorage.py", "memorystorage")
+    path = temp_db("bench_concurrency")
+    try:
+        seed = storage.SQLiteDB(path)
+        seed.add_users_many((f"user{i}@example.com", f"user{i}", "hash") for i in range(max(args.threads)))
+        seed.add_products_many(("user0@example.com", f"Item {i}", "desc", "Books", float(i % 500), "img.png")
+                               for i in range(N_PRODUCTS))
+        seed.close()
+
+        print(f"{args.ops} ops per run, {N_PRODUCTS} products")
+        print(f"{'model':>7} {'threads':>7} {'reads/s':>9} {'writes/s':>9} {'writes/commit':>14}")
+        for model in ("locked", "pooled"):
+            for n in args.threads:
+                db = LockedDB(path) if model == "locked" else storage.SQLiteDB(path, readers=n)
+                reads, writes, per_commit = measure(db, n, args.ops)
+                db.close()
+                # The locked model commits every write on its own
+                print(f"{model:>7} {n:>7} {reads:>9.0f} {writes:>9.0f} {per_commit or 1.0:>14.1f}")
+    finally:
+        remove_db(path)
+
+
+if __name__ == "__main__":
+    main()
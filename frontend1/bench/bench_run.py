@@ -0,0 +1,96 @@
+"""Queries per second through frontend.run(): connect-per-call vs pooled.
+
+    python bench/bench_run.py --products 5000 --queries 20000 --threads 1 4
+"""
+import argparse
+import sqlite3
+import threading
+import time
+
+from _common import load_frontend, remove_db, temp_db
+
+
+def legacy_run(db_path):
+    # The pre-pool run(): a fresh connection per statement.
+    def run(query, params=(), fetchone=False, fetchall=False, commit=False):
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        cur = conn.cursor()
+        cur.execute(query, params)
+        if commit:
+            conn.commit()
+        r = None
+        if fetchone:
+            r = cur.fetchone()
+        elif fetchall:
+            r = cur.fetchall()
+        conn.close()
+        return r
+    return run
+
+
+def seed(fe, n_products):
+    fe.init_db()
+    fe.register_user("bench@example.com", "pw", "bench")
+    cats = fe.get_all_categories()
+    with fe.get_conn() as conn:
+        conn.executemany(
+            """INSERT INTO products(user_id,title,description,category,price,image,created_at)
+               VALUES(1,?,?,?,?,'placeholder.jpg','2024-01-01T00:00:00')""",
+            [(f"Item {i}", f"Description {i}", cats[i % len(cats)], float(i % 500))
+             for i in range(n_products)])
+        conn.commit()
+
+
+def workload(n_products):
+    # Roughly what one Browse render issues: categories, a page, point lookups.
+    yield ("SELECT name FROM categories ORDER BY name", (), "fetchall")
+    yield ("SELECT id,title,description,category,price,image FROM products "
+           "WHERE 1=1 ORDER BY id DESC LIMIT ? OFFSET ?", (50, 0), "fetchall")
+    for pid in range(1, 9):
+        yield ("SELECT id,user_id,title,description,category,price,image "
+               "FROM products WHERE id=?", ((pid * 7919) % n_products + 1,), "fetchone")
+
+
+def measure(run, n_products, n_queries, n_threads):
+    per_thread = n_queries // n_threads
+
+    def worker():
+        done = 0
+        while done < per_thread:
+            for q, params, mode in workload(n_products):
+                run(q, params, **{mode: True})
+                done += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return per_thread * n_threads / (time.perf_counter() - start)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--products", type=int, default=5000)
+    ap.add_argument("--queries", type=int, default=20000)
+    ap.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    args = ap.parse_args()
+
+    db_path = temp_db("bench_run")
+    try:
+        fe = load_frontend(db_path)
+        seed(fe, args.products)
+        n = args.products
+        print(f"{'threads':>7} {'legacy qps':>12} {'pooled qps':>12} {'speedup':>8}")
+        for n_threads in args.threads:
+            before = measure(legacy_run(db_path), n, args.queries, n_threads)
+            after = measure(fe.run, n, args.queries, n_threads)
+            print(f"{n_threads:>7} {before:>12.0f} {after:>12.0f} {after / before:>7.1f}x")
+        fe.get_pool().close()
+    finally:
+        remove_db(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""EXPLAIN QUERY PLAN checks for the browse, seller-listing and order-history indexes.
+
+Builds a throwaway catalog, runs the planner over each query shape and
+exits non-zero if an expected index is not used, or if a keyset page
+sorts its whole filtered set (a TEMP B-TREE step) instead of walking an
+index in page order.
+
+    python bench/check_plans.py
+"""
+import sys
+
+from _common import load_frontend, remove_db, temp_db
+
+N_PRODUCTS = 20000
+
+
+def seed(fe):
+    fe.init_db()
+    cats = fe.get_all_categories()
+    with fe.transaction() as conn:
+        conn.executemany("INSERT INTO users(email,password_hash,username) VALUES(?,?,?)",
+                         [(f"u{i}@example.com", "x", f"u{i}") for i in range(100)])
+        conn.executemany(
+            """INSERT INTO products(user_id,title,description,category,price,image,created_at)
+               VALUES(?,?,?,?,?,'placeholder.jpg',?)""",
+            [(i % 100 + 1, f"Item {i}", "", cats[i % len(cats)], float(i % 500),
+              f"2024-01-01T00:00:{i % 60:02d}") for i in range(N_PRODUCTS)])
+
+
+def checks(fe):
+    _, cursor = fe.browse_page(category="Books", min_price=0, max_price=100, limit=10)
+    # (name, (query, params), indexes the plan must use, keyset page)
+    cases = [
+        ("browse: category + price range",
+         fe.browse_page_sql(category="Books", min_price=10, max_price=100)[:2],
+         ("idx_products_category_id",), True),
+        ("browse: category + price range, next page",
+         fe.browse_page_sql(category="Books", min_price=10, max_price=100, cursor=cursor)[:2],
+         ("idx_products_category_id",), True),
+        ("browse: category + min price",
+         fe.browse_page_sql(category="Books", min_price=10)[:2],
+         ("idx_products_category_id",), True),
+        ("browse: price range only",
+         fe.browse_page_sql(min_price=10, max_price=100)[:2],
+         (), True),
+        ("browse: price range only, next page",
+         fe.browse_page_sql(min_price=10, max_price=100, cursor=cursor)[:2],
+         (), True),
+        ("seller listings",
+         (fe.MY_PRODUCTS_SQL, (7,)),
+         ("idx_products_user_created",), False),
+        # The outer ORDER BY only sorts the items of one page of orders
+        ("purchase history page",
+         (fe.PURCHASES_PAGE_SQL, (7, 2**63 - 1, 21)),
+         ("idx_orders_user", "idx_order_items_order"), False),
+    ]
+    failed = 0
+    for name, (query, params), indexes, keyset in cases:
+        plan = fe.explain(query, params)
+        ok = all(any(index in step for step in plan) for index in indexes)
+        if keyset and any("TEMP B-TREE" in step for step in plan):
+            ok = False
+        failed += not ok
+        print(f"[{'ok' if ok else 'FAIL'}] {name}")
+        for step in plan:
+            print(f"       {step}")
+    return failed
+
+
+def main():
+    db_path = temp_db("check_plans")
+    try:
+        fe = load_frontend(db_path)
+        seed(fe)
+        failed = checks(fe)
+        fe.get_pool().close()
+    finally:
+        remove_db(db_path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
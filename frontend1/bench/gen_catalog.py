@@ -0,0 +1,181 @@
+"""Synthetic eco_finds data at production scale, streamed to JSONL or CSV.
+
+Writes one file per table (users, products, cart, orders, order_items)
+with explicit ids, so load_catalog.py can ingest them without lookups.
+The same --seed and sizes always produce byte-identical files. Rows are
+written as they are generated; only each product's title and price are
+kept in memory, for the order-line snapshots.
+
+Every generated account has the password "password".
+
+    python bench/gen_catalog.py --out /tmp/catalog --users 100000 --products 2000000
+    python bench/gen_catalog.py --out /tmp/catalog --format csv --seed 7
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import time
+from array import array
+from datetime import datetime, timedelta
+
+COLUMNS = {
+    "users": ("id", "email", "password_hash", "username"),
+    "products": ("id", "user_id", "title", "description", "category", "price", "image", "created_at"),
+    "cart": ("id", "user_id", "product_id", "quantity"),
+    "orders": ("id", "user_id", "created_at"),
+    "order_items": ("id", "order_id", "product_id", "title", "price", "quantity"),
+}
+
+# category -> (nouns, median price); names match the categories migration
+CATALOG = {
+    "Clothes": (("Jacket", "Jeans", "Sweater", "Dress", "Shirt", "Coat", "Hoodie", "Skirt"), 35.0),
+    "Books": (("Textbook", "Novel", "Cookbook", "Atlas", "Comic Set", "Biography", "Dictionary"), 12.0),
+    "Electronics": (("Earbuds", "Tablet", "Monitor", "Keyboard", "Camera", "Speaker", "Router"), 80.0),
+    "Furniture": (("Chair", "Desk", "Bookshelf", "Sofa", "Nightstand", "Dresser", "Stool"), 90.0),
+    "Accessories": (("Sunglasses", "Watch", "Backpack", "Wallet", "Belt", "Scarf", "Handbag"), 25.0),
+    "Sports Equipment": (("Yoga Mat", "Dumbbells", "Tennis Racket", "Bicycle", "Helmet", "Skates"), 40.0),
+    "Home Decor": (("Cushion Cover", "Lamp", "Mirror", "Vase", "Rug", "Wall Clock", "Frame"), 18.0),
+    "Beauty & Personal Care": (("Hair Dryer", "Face Cream", "Perfume", "Trimmer", "Brush Set"), 15.0),
+    "Toys & Games": (("Board Game", "Puzzle", "Lego Set", "Doll House", "RC Car", "Card Game"), 20.0),
+    "Kitchenware": (("Cooking Pan", "Blender", "Knife Set", "Kettle", "Toaster", "Dinner Set"), 30.0),
+}
+CATEGORIES = tuple(CATALOG)
+ADJECTIVES = ("Vintage", "Used", "Like-new", "Classic", "Compact", "Wooden", "Leather", "Retro",
+              "Refurbished", "Handmade", "Large", "Small", "Blue", "Black", "Organic", "Sturdy")
+CONDITIONS = ("Gently used.", "Like new, barely used.", "Minor scratches, works perfectly.",
+              "Some signs of wear.", "Original box included.", "Pick-up only.", "Smoke-free home.")
+IMAGES = ("placeholder.jpg", "https://via.placeholder.com/600x400?text=Image")
+EPOCH = datetime(2023, 1, 1)
+SPAN_SECONDS = 2 * 365 * 24 * 3600
+
+
+class TableWriter:
+    """Writes rows for one table as JSON lines or CSV with a header row."""
+
+    def __init__(self, out_dir, table, fmt):
+        self.columns = COLUMNS[table]
+        self.rows = 0
+        self._f = open(os.path.join(out_dir, f"{table}.{fmt}"), "w", encoding="utf-8", newline="")
+        if fmt == "csv":
+            self._csv = csv.writer(self._f)
+            self._csv.writerow(self.columns)
+        else:
+            self._csv = None
+
+    def write(self, row):
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self._f.write(json.dumps(dict(zip(self.columns, row)), ensure_ascii=False))
+            self._f.write("\n")
+        self.rows += 1
+
+    def close(self):
+        self._f.close()
+
+
+def timestamp(rng):
+    return (EPOCH + timedelta(seconds=rng.randrange(SPAN_SECONDS))).isoformat()
+
+
+def gen_users(rng, w, n):
+    pw_hash = hashlib.sha256(b"password").hexdigest()
+    for uid in range(1, n + 1):
+        w.write((uid, f"user{uid}@example.com", pw_hash, f"user{uid}"))
+
+
+def gen_products(rng, w, n, n_users):
+    """Write n products; return their titles and prices for order snapshots."""
+    titles = []
+    prices = array("d")
+    for pid in range(1, n + 1):
+        category = rng.choice(CATEGORIES)
+        nouns, median = CATALOG[category]
+        title = f"{rng.choice(ADJECTIVES)} {rng.choice(nouns)}"
+        # Right-skewed around the category median, rounded to the cent
+        price = round(max(1.0, rng.lognormvariate(0.0, 0.6) * median), 2)
+        description = f"{title} in {category.lower()}. {rng.choice(CONDITIONS)}"
+        w.write((pid, rng.randint(1, n_users), title, description, category, price,
+                 rng.choice(IMAGES), timestamp(rng)))
+        titles.append(title)
+        prices.append(price)
+    return titles, prices
+
+
+def gen_carts(rng, w, n_users, n_products, cart_rate, max_cart):
+    line_id = 0
+    for uid in range(1, n_users + 1):
+        if rng.random() >= cart_rate:
+            continue
+        size = min(rng.randint(1, max_cart), n_products)
+        for pid in rng.sample(range(1, n_products + 1), size):
+            line_id += 1
+            w.write((line_id, uid, pid, rng.choice((1, 1, 1, 2, 3))))
+
+
+def gen_orders(rng, w_orders, w_items, n_users, titles, prices, orders_per_user, max_items):
+    n_products = len(titles)
+    order_id = item_id = 0
+    for uid in range(1, n_users + 1):
+        # Geometric with the requested mean: most users order a little, a few a lot
+        count = 0
+        while rng.random() < orders_per_user / (orders_per_user + 1):
+            count += 1
+        for _ in range(count):
+            order_id += 1
+            w_orders.write((order_id, uid, timestamp(rng)))
+            for _ in range(rng.randint(1, max_items)):
+                item_id += 1
+                pid = rng.randint(1, n_products)
+                w_items.write((item_id, order_id, pid, titles[pid - 1], prices[pid - 1],
+                               rng.choice((1, 1, 1, 2))))
+
+
+def generate(out_dir, fmt="jsonl", seed=42, users=10000, products=100000, cart_rate=0.3,
+             max_cart=5, orders_per_user=2.0, max_items=4):
+    """Write every table under out_dir; return {table: rows written}."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    writers = {table: TableWriter(out_dir, table, fmt) for table in COLUMNS}
+    try:
+        gen_users(rng, writers["users"], users)
+        titles, prices = gen_products(rng, writers["products"], products, users)
+        gen_carts(rng, writers["cart"], users, products, cart_rate, max_cart)
+        gen_orders(rng, writers["orders"], writers["order_items"], users, titles, prices,
+                   orders_per_user, max_items)
+    finally:
+        for w in writers.values():
+            w.close()
+    return {table: w.rows for table, w in writers.items()}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--out", required=True, help="directory for the generated files")
+    ap.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--users", type=int, default=10000)
+    ap.add_argument("--products", type=int, default=100000)
+    ap.add_argument("--cart-rate", type=float, default=0.3, help="share of users with a cart")
+    ap.add_argument("--max-cart", type=int, default=5)
+    ap.add_argument("--orders-per-user", type=float, default=2.0, help="mean orders per user")
+    ap.add_argument("--max-items", type=int, default=4, help="most lines in one order")
+    args = ap.parse_args()
+    if args.users < 1 or args.products < 1:
+        ap.error("--users and --products must be at least 1")
+
+    start = time.perf_counter()
+    counts = generate(args.out, args.format, args.seed, args.users, args.products, args.cart_rate,
+                      args.max_cart, args.orders_per_user, args.max_items)
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    for table, rows in counts.items():
+        print(f"{table:>12} {rows:>12,}")
+    print(f"{'total':>12} {total:>12,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Bulk-load gen_catalog.py output into an eco_finds database.
+
+The schema comes from the app's own migrations. For the load itself the
+journal and fsyncs are switched off, secondary indexes and triggers are
+dropped, and rows go in through chunked executemany(), one transaction
+per table. Afterwards the indexes and triggers are recreated, the
+full-text index and the maintained aggregates are rebuilt in one pass
+each, and the database is put back in WAL mode. Not crash-safe: load
+into a fresh or disposable file.
+
+    python bench/load_catalog.py --data /tmp/catalog --db eco_finds.db
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from _common import load_frontend
+from gen_catalog import COLUMNS
+
+IMPORT_PRAGMAS = (
+    ("journal_mode", "OFF"),
+    ("synchronous", "OFF"),
+    ("locking_mode", "EXCLUSIVE"),
+    ("temp_store", "MEMORY"),
+    ("cache_size", -262144),     # KiB, i.e. 256 MB while loading
+)
+# Parents before children
+LOAD_ORDER = ("users", "products", "cart", "orders", "order_items")
+
+
+def read_rows(path, columns):
+    """Yield tuples in column order from a .jsonl or .csv file."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            reader = csv.reader(f)
+            header = next(reader)
+            order = [header.index(c) for c in columns]
+            for rec in reader:
+                yield tuple(rec[i] for i in order)
+        else:
+            for line in f:
+                rec = json.loads(line)
+                yield tuple(rec[c] for c in columns)
+
+
+def find_file(data_dir, table):
+    for ext in ("jsonl", "csv"):
+        path = os.path.join(data_dir, f"{table}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def drop_deferred(conn):
+    """Drop explicit indexes and triggers; return their CREATE statements."""
+    rows = conn.execute("""SELECT type, name, sql FROM sqlite_master
+                           WHERE type IN ('index', 'trigger') AND sql IS NOT NULL""").fetchall()
+    for kind, name, _ in rows:
+        conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+    return [sql for _, _, sql in rows]
+
+
+def load_table(conn, table, rows, chunk_size):
+    columns = COLUMNS[table]
+    sql = f"INSERT INTO {table}({','.join(columns)}) VALUES({','.join('?' * len(columns))})"
+    count = 0
+    conn.execute("BEGIN")
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        conn.executemany(sql, chunk)
+        count += len(chunk)
+    conn.commit()
+    return count
+
+
+def load(db_path, data_dir, chunk_size=10000):
+    """Load every table file found in data_dir; return [(step, rows, seconds)]."""
+    fe = load_frontend(db_path)
+    conn = fe.open_conn(db_path)
+    fe.migrate(conn)
+    for name, value in IMPORT_PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    report = []
+    try:
+        deferred = drop_deferred(conn)
+        conn.commit()
+        for table in LOAD_ORDER:
+            path = find_file(data_dir, table)
+            if path is None:
+                continue
+            start = time.perf_counter()
+            rows = load_table(conn, table, read_rows(path, COLUMNS[table]), chunk_size)
+            report.append((table, rows, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        conn.execute("BEGIN")
+        for sql in deferred:
+            conn.execute(sql)
+        conn.execute("INSERT INTO products_fts(products_fts) VALUES('rebuild')")
+        conn.commit()
+        report.append(("indexes + fts", None, time.perf_counter() - start))
+        start = time.perf_counter()
+        conn.execute("BEGIN")
+        fe.rebuild_facets(conn)
+        fe.rebuild_user_stats(conn)
+        fe.rebuild_order_totals(conn)
+        conn.commit()
+        report.append(("aggregates", None, time.perf_counter() - start))
+        start = time.perf_counter()
+        conn.execute("ANALYZE")
+        report.append(("analyze", None, time.perf_counter() - start))
+    finally:
+        conn.execute("PRAGMA locking_mode=NORMAL")
+        conn.execute(f"PRAGMA journal_mode={dict(fe.DB_PRAGMAS)['journal_mode']}")
+        conn.close()
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--data", required=True, help="directory written by gen_catalog.py")
+    ap.add_argument("--db", default="eco_finds.db")
+    ap.add_argument("--chunk-size", type=int, default=10000)
+    args = ap.parse_args()
+
+    report = load(args.db, args.data, args.chunk_size)
+    total_rows = sum(rows for _, rows, _ in report if rows)
+    total_time = sum(seconds for _, _, seconds in report)
+    print(f"{'step':>14} {'rows':>12} {'seconds':>8} {'rows/s':>10}")
+    for step, rows, seconds in report:
+        if rows is None:
+            print(f"{step:>14} {'':>12} {seconds:>8.2f}")
+        else:
+            print(f"{step:>14} {rows:>12,} {seconds:>8.2f} {rows / seconds:>10,.0f}")
+    print(f"{'total':>14} {total_rows:>12,} {total_time:>8.2f} {total_rows / total_time:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
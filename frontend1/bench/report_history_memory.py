@@ -0,0 +1,82 @@
+"""Bytes per purchase held by PurchaseHistoryManager, before and after snapshot interning.
+
+Synthetic workload: a catalog whose prices change now and then, bought
+repeatedly by many users. Memory is measured with tracemalloc as the
+growth from an empty manager to one holding every purchase.
+
+    python bench/report_history_memory.py --purchases 1000000
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+
+from _common import load_module
+
+
+class LegacyPurchaseHistoryManager:
+    # The pre-interning store: one dict per purchase holding its own product copy.
+    def __init__(self):
+        self.purchases = []
+
+    def record_purchase(self, user_email, product, timestamp):
+        self.purchases.append({
+            "user_email": user_email,
+            "product_id": product.get("id"),
+            "timestamp": timestamp,
+            "product_snapshot": product.copy(),
+        })
+        return True
+
+
+def workload(n_purchases, n_products, n_users, seed):
+    rng = random.Random(seed)
+    categories = ["Clothes", "Books", "Electronics", "Furniture", "Home Decor"]
+    catalog = [{"id": i, "title": f"Item {i}", "category": categories[i % len(categories)],
+                "price": float(rng.randint(5, 500)), "owner": f"seller{i % 97}@example.com",
+                "image": "placeholder.png"} for i in range(n_products)]
+    users = [f"user{i}@example.com" for i in range(n_users)]
+    for n in range(n_purchases):
+        product = catalog[int(rng.paretovariate(1.2)) % n_products]
+        if rng.random() < 0.001:
+            # An occasional price change creates a new product state
+            product = catalog[product["id"]] = dict(product, price=float(rng.randint(5, 500)))
+        # The caller hands over its own dict, as a request handler would
+        yield users[rng.randrange(n_users)], dict(product), f"2024-01-01T00:00:00.{n:06d}"
+
+
+def measure(factory, args):
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    manager = factory()
+    for user_email, product, timestamp in workload(args.purchases, args.products,
+                                                   args.users, args.seed):
+        manager.record_purchase(user_email, product, timestamp)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return manager, used
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--purchases", type=int, default=1_000_000)
+    ap.add_argument("--products", type=int, default=5_000)
+    ap.add_argument("--users", type=int, default=50_000)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    history = load_module("history1 (2).py", "history")
+    print(f"{args.purchases} purchases, {args.products} products, {args.users} users")
+    print(f"{'store':>8} {'MiB':>9} {'bytes/purchase':>15} {'snapshots':>10}")
+    for name, factory in (("legacy", LegacyPurchaseHistoryManager),
+                          ("interned", history.PurchaseHistoryManager)):
+        manager, used = measure(factory, args)
+        snapshots = manager.snapshot_count() if hasattr(manager, "snapshot_count") else len(manager.purchases)
+        print(f"{name:>8} {used / 2**20:>9.1f} {used / args.purchases:>15.1f} {snapshots:>10}")
+        del manager
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Benchmark suite for the storage and catalog hot paths, with a regression check.
+
+`run` builds a fixed-seed dataset for each listing count with
+gen_catalog.py and times single calls against three stores:
+
+  frontend  ft/frontend.py on a database filled by load_catalog.py
+            (browse_products under every filter combination, get_product,
+            add_to_cart, view_cart, cart_total, checkout, purchases_page)
+  sqlitedb  memorystorage.SQLiteDB holding the same rows
+  memory    the in-memory stores in products.py, cart.py and history1 (2).py
+
+browse_products is timed through its loader, so the catalog cache does
+not hide the query. Results are written as JSON, keyed "<listings>/<store>.<case>",
+with per-call timings in microseconds.
+
+`compare` checks a run against a stored baseline and exits non-zero if a
+case got slower by more than --threshold and by more than --min-delta-us.
+
+    python bench/suite.py run --sizes 10000 100000 --out results/baseline.json
+    python bench/suite.py run --sizes 10000 100000 --out results/current.json
+    python bench/suite.py compare results/baseline.json results/current.json
+
+A 1M-listing run (--sizes 1000000) needs a few GB of RAM and several minutes of setup.
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from _common import load_frontend, load_module, summarize
+from gen_catalog import ADJECTIVES, CATALOG, COLUMNS, generate
+from load_catalog import find_file, load, read_rows
+
+DEFAULT_SIZES = (10000, 100000)
+DEFAULT_SAMPLES = 200
+SCAN_SAMPLES = 10   # for cases that return the whole catalog
+METRICS = ("mean", "p50", "p99")
+# products.py has its own, shorter category list
+MEMORY_CATEGORY = {"Clothes": "Clothing", "Books": "Books", "Electronics": "Electronics",
+                   "Furniture": "Home", "Home Decor": "Home", "Kitchenware": "Home"}
+
+
+class Recorder:
+    """Times one call per sample and stores the summary under size/name."""
+
+    def __init__(self, size):
+        self.size = size
+        self.results = {}
+
+    def case(self, name, fn, calls, setup=None):
+        samples = []
+        gc.collect()
+        for args in calls:
+            if setup is not None:
+                setup(*args)
+            start = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - start)
+        stats = summarize(samples)
+        stats.update({m: stats[m] * 1e6 for m in METRICS})
+        self.results[f"{self.size}/{name}"] = stats
+        print(f"{self.size:>9} {name:<50} {stats['p50']:>10.1f} {stats['p99']:>10.1f}")
+
+
+def table(data_dir, name):
+    cols = COLUMNS[name]
+    return read_rows(find_file(data_dir, name), cols)
+
+
+def browse_filters(rng, samples):
+    """(name, [(category, keyword, min_price, max_price), ...]) for every filter combination."""
+    nouns = [noun for names, _ in CATALOG.values() for noun in names]
+    for combo in itertools.product((False, True), repeat=4):
+        used = [f for f, on in zip(("category", "keyword", "min", "max"), combo) if on]
+        calls = []
+        for _ in range(samples):
+            low = round(rng.uniform(5, 100), 2)
+            calls.append((rng.choice(list(CATALOG)) if combo[0] else None,
+                          rng.choice(nouns + list(ADJECTIVES)) if combo[1] else None,
+                          low if combo[2] else None,
+                          low + rng.choice((10, 50, 200)) if combo[3] else None))
+        yield f"browse_products[{'+'.join(used) or 'none'}]", calls
+
+
+def bench_frontend(rec, data_dir, workdir, counts, samples, rng):
+    db_path = os.path.join(workdir, "frontend.db")
+    load(db_path, data_dir)
+    fe = load_frontend(db_path)
+    n_products, n_users = counts["products"], counts["users"]
+    cart_users = sorted({row[1] for row in table(data_dir, "cart")}) or [1]
+
+    for name, calls in browse_filters(rng, samples):
+        rec.case(f"frontend.{name}", fe._load_browse_products,
+                 [(*filters, 100, 0) for filters in calls])
+    rec.case("frontend.get_product", fe.get_product,
+             [(rng.randint(1, n_products),) for _ in range(samples)])
+    rec.case("frontend.view_cart", fe.view_cart,
+             [(rng.choice(cart_users),) for _ in range(samples)])
+    rec.case("frontend.cart_total", fe.cart_total,
+             [(rng.choice(cart_users),) for _ in range(samples)])
+    rec.case("frontend.purchases_page", fe.purchases_page,
+             [(rng.randint(1, n_users),) for _ in range(samples)])
+    rec.case("frontend.add_to_cart", fe.add_to_cart,
+             [(rng.randint(1, n_users), rng.randint(1, n_products)) for _ in range(samples)])
+
+    def fill_cart(uid):
+        for _ in range(3):
+            fe.add_to_cart(uid, rng.randint(1, n_products))
+    rec.case("frontend.checkout[3 lines]", fe.checkout,
+             [(rng.randint(1, n_users),) for _ in range(samples)], setup=fill_cart)
+    fe.get_pool().close()
+
+
+def bench_sqlitedb(rec, data_dir, workdir, counts, samples, rng):
+    storage = load_module("memorystorage.py", "memorystorage")
+    db = storage.SQLiteDB(os.path.join(workdir, "sqlitedb.db"))
+    email = "user{}@example.com".format
+    db.add_users_many((e, u, h) for _, e, h, u in table(data_dir, "users"))
+    db.add_products_many((email(uid), title, desc, cat, price, image)
+                         for _, uid, title, desc, cat, price, image, _ in table(data_dir, "products"))
+    db.add_to_cart_many((email(uid), pid, qty) for _, uid, pid, qty in table(data_dir, "cart"))
+    buyer = {oid: uid for oid, uid, _ in table(data_dir, "orders")}
+    db.record_purchases_many((email(buyer[oid]), pid) for _, oid, pid, *_ in table(data_dir, "order_items"))
+    n_products, n_users = counts["products"], counts["users"]
+
+    rec.case("sqlitedb.get_product", db.get_product,
+             [(rng.randint(1, n_products),) for _ in range(samples)])
+    rec.case("sqlitedb.list_products", db.list_products, [()] * SCAN_SAMPLES)
+    rec.case("sqlitedb.get_cart", db.get_cart,
+             [(email(rng.randint(1, n_users)),) for _ in range(samples)])
+    rec.case("sqlitedb.get_purchase_history", lambda e: list(db.get_purchase_history(e)),
+             [(email(rng.randint(1, n_users)),) for _ in range(samples)])
+    rec.case("sqlitedb.add_to_cart", db.add_to_cart,
+             [(email(rng.randint(1, n_users)), rng.randint(1, n_products)) for _ in range(samples)])
+    rec.case("sqlitedb.record_purchase", db.record_purchase,
+             [(email(rng.randint(1, n_users)), rng.randint(1, n_products)) for _ in range(samples)])
+    db.close()
+
+
+def bench_memory(rec, data_dir, workdir, counts, samples, rng):
+    # Fresh module state for every size; cart.py imports from "products"
+    products = load_module("products.py", "products")
+    cart = load_module("cart.py", "cart")
+    history = load_module("history1 (2).py", "purchase_history").PurchaseHistoryManager()
+    email = "user{}@example.com".format
+
+    # Created in price order so the sorted price index only ever appends;
+    # ids therefore rise with price.
+    rows = sorted(table(data_dir, "products"), key=lambda r: (r[5], r[0]))
+    for _, uid, title, desc, cat, price, _, _ in rows:
+        products.create_product(title, desc, MEMORY_CATEGORY.get(cat, "Other"), price, email(uid))
+    del rows
+    for _, uid, pid, qty in table(data_dir, "cart"):
+        cart.add_to_cart(email(uid), pid, qty)
+    orders = {oid: (uid, created) for oid, uid, created in table(data_dir, "orders")}
+    for _, oid, pid, title, price, _ in table(data_dir, "order_items"):
+        uid, created = orders[oid]
+        history.record_purchase(email(uid), {"id": pid, "title": title, "price": price}, created)
+    del orders
+    n_products, n_users = counts["products"], counts["users"]
+    categories = products.categories
+
+    for combo in itertools.product((False, True), repeat=4):
+        used = [f for f, on in zip(("category", "search", "min", "max"), combo) if on]
+        calls = []
+        for _ in range(samples if any(combo) else SCAN_SAMPLES):
+            low = round(rng.uniform(5, 100), 2)
+            calls.append((rng.choice(categories) if combo[0] else None,
+                          rng.choice(ADJECTIVES).lower() if combo[1] else None,
+                          low if combo[2] else None,
+                          low + rng.choice((10, 50, 200)) if combo[3] else None))
+        rec.case(f"memory.list_products[{'+'.join(used) or 'none'}]", products.list_products, calls)
+    rec.case("memory.get_product", products.get_product,
+             [(rng.randint(1, n_products),) for _ in range(samples)])
+    rec.case("memory.add_to_cart", cart.add_to_cart,
+             [(email(rng.randint(1, n_users)), rng.randint(1, n_products)) for _ in range(samples)])
+    rec.case("memory.view_cart", cart.view_cart,
+             [(email(rng.randint(1, n_users)),) for _ in range(samples)])
+    rec.case("memory.view_cart_with_totals", cart.view_cart_with_totals,
+             [(email(rng.randint(1, n_users)),) for _ in range(samples)])
+    rec.case("memory.get_purchase_history", history.get_purchase_history,
+             [(email(rng.randint(1, n_users)),) for _ in range(samples)])
+    rec.case("memory.get_recent_purchases", history.get_recent_purchases,
+             [(email(rng.randint(1, n_users)),) for _ in range(samples)])
+    rec.case("memory.record_purchase", history.record_purchase,
+             [(email(rng.randint(1, n_users)), {"id": rng.randint(1, n_products), "title": "x", "price": 1.0},
+               datetime(2025, 1, 1).isoformat()) for _ in range(samples)])
+
+
+STORES = {"frontend": bench_frontend, "sqlitedb": bench_sqlitedb, "memory": bench_memory}
+
+
+def run(args):
+    meta = {
+        "created": datetime.utcnow().isoformat(),
+        "seed": args.seed,
+        "samples": args.samples,
+        "sizes": args.sizes,
+        "stores": args.stores,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+    results = {}
+    print(f"{'listings':>9} {'case':<50} {'p50 us':>10} {'p99 us':>10}")
+    for size in args.sizes:
+        workdir = tempfile.mkdtemp(prefix=f"bench_suite_{size}_")
+        try:
+            data_dir = os.path.join(workdir, "data")
+            counts = generate(data_dir, seed=args.seed, users=max(10, size // 10), products=size)
+            rec = Recorder(size)
+            for store in args.stores:
+                # Each store draws its own inputs, so selecting stores does not shift them
+                STORES[store](rec, data_dir, workdir, counts, args.samples,
+                              random.Random(f"{args.seed}/{size}/{store}"))
+            results.update(rec.results)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=1, sort_keys=True)
+    print(f"wrote {len(results)} cases to {args.out}")
+    return 0
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        cur = json.load(f)
+    for key in ("seed", "samples", "python", "sqlite", "machine"):
+        if base["meta"].get(key) != cur["meta"].get(key):
+            print(f"note: {key} differs ({base['meta'].get(key)} -> {cur['meta'].get(key)})")
+
+    regressions = 0
+    print(f"{'case':<58} {'base us':>10} {'now us':>10} {'change':>8}")
+    for key in sorted(base["results"].keys() & cur["results"].keys(),
+                      key=lambda k: (int(k.split("/")[0]), k)):
+        b = base["results"][key][args.metric]
+        c = cur["results"][key][args.metric]
+        change = (c - b) / b if b else 0.0
+        slower = change > args.threshold and c - b > args.min_delta_us
+        faster = -change > args.threshold and b - c > args.min_delta_us
+        regressions += slower
+        mark = "REGRESSED" if slower else "faster" if faster else ""
+        print(f"{key:<58} {b:>10.1f} {c:>10.1f} {change:>+7.0%} {mark}")
+    for key in sorted(base["results"].keys() - cur["results"].keys()):
+        print(f"{key:<58} missing from current run")
+    for key in sorted(cur["results"].keys() - base["results"].keys()):
+        print(f"{key:<58} new, no baseline")
+    print(f"{regressions} regression(s) on {args.metric} beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("run", help="run the suite and write results as JSON")
+    r.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="listing counts")
+    r.add_argument("--stores", nargs="+", choices=list(STORES), default=list(STORES))
+    r.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="timed calls per case")
+    r.add_argument("--seed", type=int, default=42)
+    r.add_argument("--out", default="results/current.json")
+    c = sub.add_parser("compare", help="flag regressions against a baseline run")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    c.add_argument("--metric", choices=METRICS, default="p50")
+    c.add_argument("--threshold", type=float, default=0.15, help="relative slowdown to flag, 0.15 = 15%%")
+    c.add_argument("--min-delta-us", type=float, default=5.0,
+                   help="ignore slowdowns smaller than this many microseconds")
+    args = ap.parse_args()
+    sys.exit(run(args) if args.command == "run" else compare(args))
+
+
+if __name__ == "__main__":
+    main()
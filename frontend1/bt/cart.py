@@ -1,38 +1,65 @@
-from typing import List, Dict, Optional
-from product import get_product, Product
+from typing import List, Dict, Optional, Tuple
+from products import get_product, Product
 
-# In-memory storage for carts: user_email -> list of product IDs
-carts: Dict[str, List[int]] = {}
+# In-memory storage for carts: user_email -> {product_id: quantity}, in the order items were added
+carts: Dict[str, Dict[int, int]] = {}
 
-# Add product to cart
-def add_to_cart(user_email: str, product_id: int) -> bool:
-    if get_product(product_id) is None:
+# Add product to cart (adding an item already in the cart increases its quantity)
+def add_to_cart(user_email: str, product_id: int, quantity: int = 1) -> bool:
+    if quantity <= 0 or get_product(product_id) is None:
         return False
-    if user_email not in carts:
-        carts[user_email] = []
-    if product_id not in carts[user_email]:
-        carts[user_email].append(product_id)
-        return True
-    return False  # Already in cart
+    cart = carts.setdefault(user_email, {})
+    cart[product_id] = cart.get(product_id, 0) + quantity
+    return True
 
 # Remove product from cart
 def remove_from_cart(user_email: str, product_id: int) -> bool:
-    if user_email not in carts or product_id not in carts[user_email]:
+    cart = carts.get(user_email)
+    if not cart or product_id not in cart:
+        return False
+    del cart[product_id]
+    return True
+
+# Set the quantity of a product already in the cart (0 or less removes it)
+def update_quantity(user_email: str, product_id: int, quantity: int) -> bool:
+    cart = carts.get(user_email)
+    if not cart or product_id not in cart:
         return False
-    carts[user_email].remove(product_id)
+    if quantity <= 0:
+        del cart[product_id]
+    else:
+        cart[product_id] = quantity
     return True
 
+def get_quantity(user_email: str, product_id: int) -> int:
+    return carts.get(user_email, {}).get(product_id, 0)
+
+# Resolve every line once: returns ([(product, quantity), ...], item count, total price)
+def view_cart_with_totals(user_email: str) -> Tuple[List[Tuple[Product, int]], int, float]:
+    lines = []
+    count = 0
+    total = 0.0
+    for pid, qty in carts.get(user_email, {}).items():
+        prod = get_product(pid)
+        if prod is None:
+            continue
+        lines.append((prod, qty))
+        count += qty
+        total += prod.price * qty
+    return lines, count, total
+
 # View cart contents (returns list of Product objects)
 def view_cart(user_email: str) -> List[Product]:
-    if user_email not in carts:
-        return []
-    return [get_product(pid) for pid in carts[user_email] if get_product(pid) is not None]
+    return [prod for prod, _ in view_cart_with_totals(user_email)[0]]
 
 # Example usage
 if __name__ == "__main__":
     # Assume some products exist with IDs 1 and 2, and user "alice@example.com"
     print(add_to_cart("alice@example.com", 1))  # True if added
     print(add_to_cart("alice@example.com", 2))  # True if added
+    print(add_to_cart("alice@example.com", 2, 2))  # True, quantity of 2 is now 3
     print(view_cart("alice@example.com"))  # List of Product objects
+    print(update_quantity("alice@example.com", 1, 4))  # True if updated
+    print(view_cart_with_totals("alice@example.com"))  # Lines, item count and total
     print(remove_from_cart("alice@example.com", 2))  # True if removed
-    print(view_cart("alice@example.com"))  # Should show only product with ID 1 
\ No newline at end of file
+    print(view_cart("alice@example.com"))  # Should show only product with ID 1
\ No newline at end of file
@@ -1,35 +1,101 @@
+import bisect
+import hashlib
+import json
+from typing import NamedTuple
+
+
+class Purchase(NamedTuple):
+    user_email: str
+    product_id: object
+    timestamp: object
+    product_snapshot: dict
+
+
 class PurchaseHistoryManager:
     def __init__(self):
-        # Each purchase: {user_email, product_id, timestamp, product_snapshot}
+        # Each purchase: Purchase(user_email, product_id, timestamp, product_snapshot)
         self.purchases = []
+        # Snapshots interned by content hash: identical product states are stored
+        # once and shared by every purchase that references them
+        self._snapshots = {}
+        # Per-user purchases kept sorted by timestamp, plus a parallel list of
+        # timestamps to bisect on
+        self._user_purchases = {}
+        self._user_timestamps = {}
 
     def record_purchase(self, user_email, product, timestamp):
         """
         Records a purchase for the user.
         :param user_email: str - email of the purchaser
         :param product: dict - product info (must have at least 'id')
-        :param timestamp: str/datetime - when the purchase happened
+        :param timestamp: str/datetime - when the purchase happened; one user's
+            timestamps must be mutually comparable (all ISO strings or all datetimes)
         """
         # Take a snapshot of the product at the time of purchase
-        product_snapshot = product.copy()
-        self.purchases.append({
-            "user_email": user_email,
-            "product_id": product.get("id"),
-            "timestamp": timestamp,
-            "product_snapshot": product_snapshot
-        })
+        product_snapshot = self._intern_snapshot(product)
+        purchase = Purchase(user_email, product.get("id"), timestamp, product_snapshot)
+        self.purchases.append(purchase)
+        rows = self._user_purchases.setdefault(user_email, [])
+        times = self._user_timestamps.setdefault(user_email, [])
+        # In-order arrivals land at the end; late ones are slotted into place
+        i = bisect.bisect_right(times, timestamp)
+        times.insert(i, timestamp)
+        rows.insert(i, purchase)
         return True
 
-    def get_purchase_history(self, user_email):
+    def _intern_snapshot(self, product):
+        canonical = json.dumps(product, sort_keys=True, default=repr).encode()
+        key = hashlib.blake2b(canonical, digest_size=16).digest()
+        snapshot = self._snapshots.get(key)
+        if snapshot is None:
+            snapshot = self._snapshots[key] = product.copy()
+        return snapshot
+
+    def snapshot_count(self):
+        return len(self._snapshots)
+
+    @staticmethod
+    def _entry(purchase):
+        # Snapshots are shared between purchases, so callers get their own copy
+        return {
+            "product": dict(purchase.product_snapshot),
+            "timestamp": purchase.timestamp
+        }
+
+    def _range(self, user_email, since=None, until=None):
+        times = self._user_timestamps.get(user_email, [])
+        lo = 0 if since is None else bisect.bisect_left(times, since)
+        hi = len(times) if until is None else bisect.bisect_left(times, until)
+        return lo, max(lo, hi)
+
+    def get_purchase_history(self, user_email, since=None, until=None):
         """
-        Returns a list of purchases for the given user.
+        Returns a list of purchases for the given user, oldest first.
         Each item includes: product info at purchase time, timestamp
+        :param since: optional - only purchases at or after this timestamp
+        :param until: optional - only purchases before this timestamp
         """
-        return [
-            {
-                "product": purchase["product_snapshot"],
-                "timestamp": purchase["timestamp"]
-            }
-            for purchase in self.purchases
-            if purchase["user_email"] == user_email
-        ]
\ No newline at end of file
+        lo, hi = self._range(user_email, since, until)
+        rows = self._user_purchases.get(user_email, [])
+        return [self._entry(purchase) for purchase in rows[lo:hi]]
+
+    def get_purchase_history_page(self, user_email, offset=0, limit=20, since=None, until=None):
+        """
+        Returns one page of the user's purchases (oldest first) and the total
+        number of purchases in the range, as (items, total).
+        """
+        lo, hi = self._range(user_email, since, until)
+        rows = self._user_purchases.get(user_email, [])
+        start = min(hi, lo + max(0, offset))
+        end = min(hi, start + max(0, limit))
+        return [self._entry(purchase) for purchase in rows[start:end]], hi - lo
+
+    def get_recent_purchases(self, user_email, n=10):
+        """
+        Returns the user's n most recent purchases, newest first.
+        """
+        rows = self._user_purchases.get(user_email, [])
+        return [self._entry(purchase) for purchase in reversed(rows[max(0, len(rows) - n):])]
+
+    def count_purchases(self, user_email):
+        return len(self._user_purchases.get(user_email, []))
\ No newline at end of file
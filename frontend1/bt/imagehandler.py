@@ -1,51 +1,342 @@
+import hashlib
 import os
+import re
 import shutil
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it variants fall back to the original
+    Image = None
+
+CHUNK_SIZE = 1024 * 1024
+# Sizes the Streamlit UI renders: listing cards and the product detail view
+VARIANT_SIZES = {"card": (300, 180), "detail": (600, 300)}
+# Pillow format name and encoder options per output format
+VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+PLACEHOLDER_COLOR = (228, 232, 226)
+# A content-addressed reference: sha256 hex digest plus the original extension.
+# Objects, counts and variants are keyed on the digest; the extension is only metadata.
+REF_PATTERN = re.compile(r"^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$")
+# A flat file directly in the upload folder; names werkzeug's secure_filename leaves unchanged
+PLAIN_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+class UnreadableImageError(ValueError):
+    """A stored file Pillow cannot decode, raised when placeholder_on_error is off."""
 
 class ImageHandler:
-    def __init__(self, upload_folder="uploaded_images", placeholder_path="static/placeholder.png"):
+    def __init__(self, upload_folder="uploaded_images", placeholder_path="static/placeholder.png",
+                 content_addressed=False, eager_variants=False, variant_workers=2,
+                 placeholder_on_error=True):
         self.upload_folder = upload_folder
         self.placeholder_path = placeholder_path
+        self.content_addressed = content_addressed
+        self.eager_variants = eager_variants
+        self.placeholder_on_error = placeholder_on_error
+        self.variants_folder = os.path.join(self.upload_folder, "variants")
+        self._variant_pool = ThreadPoolExecutor(max_workers=variant_workers,
+                                                thread_name_prefix="image-variants")
+        self._variant_jobs = {}  # variant key -> (future, content ref or None)
         # Ensure upload folder exists
         os.makedirs(self.upload_folder, exist_ok=True)
+        self.objects_folder = os.path.join(self.upload_folder, "objects")
+        self._refs = None
+        self._lock = threading.Lock()
+        if content_addressed:
+            os.makedirs(self.objects_folder, exist_ok=True)
+            # Reference counts live next to the objects so every process sees the same counts
+            self._refs = sqlite3.connect(os.path.join(self.upload_folder, "refcounts.db"),
+                                         check_same_thread=False, isolation_level=None)
+            self._refs.execute("PRAGMA journal_mode=WAL")
+            self._refs.execute("""CREATE TABLE IF NOT EXISTS refcounts (
+                ref TEXT PRIMARY KEY,
+                count INTEGER NOT NULL
+            )""")
+
+    def is_ref(self, name):
+        return bool(name) and REF_PATTERN.match(name) is not None
+
+    def digest(self, ref):
+        return os.path.splitext(ref)[0]
+
+    def object_path(self, ref):
+        """
+        Returns the sharded on-disk path for a content-addressed reference,
+        e.g. objects/ab/cd/abcd... (the same file whatever the extension)
+        """
+        digest = self.digest(ref)
+        return os.path.join(self.objects_folder, digest[:2], digest[2:4], digest)
+
+    def ref_count(self, ref):
+        if self._refs is None:
+            return 0
+        with self._lock:
+            row = self._refs.execute("SELECT count FROM refcounts WHERE ref = ?",
+                                     (self.digest(ref),)).fetchone()
+        return row[0] if row else 0
+
+    def retain(self, ref):
+        """
+        Adds one reference to an image that is already stored, e.g. when a
+        listing is pointed at an existing content reference.
+        :param ref: str - content reference
+        :return: bool - True if counted, False if nothing is stored under ref
+        """
+        if not (self.content_addressed and self.is_ref(ref)):
+            return False
+        with self._lock:
+            cur = self._refs.execute("UPDATE refcounts SET count = count + 1 WHERE ref = ?",
+                                     (self.digest(ref),))
+        return cur.rowcount == 1
 
     def save_image(self, image_file, filename):
         """
         Saves the uploaded image file to the upload folder.
+        In content-addressed mode the bytes are hashed while they stream to a
+        temporary file, stored once under a sharded path and reference-counted.
         :param image_file: file-like object (opened in binary mode)
-        :param filename: str - desired filename for saving
-        :return: str - path to the saved image
+        :param filename: str - desired filename for saving (only its extension
+            is kept in content-addressed mode)
+        :return: str - path to the saved image, or the content reference
+            (digest + extension) in content-addressed mode
         """
-        dest_path = os.path.join(self.upload_folder, filename)
-        with open(dest_path, "wb") as f:
-            shutil.copyfileobj(image_file, f)
-        return dest_path
+        if self.content_addressed:
+            saved = self._save_content_addressed(image_file, filename)
+        else:
+            saved = os.path.join(self.upload_folder, filename)
+            with open(saved, "wb") as f:
+                shutil.copyfileobj(image_file, f)
+        if self.eager_variants and Image is not None:
+            self.generate_variants(saved if self.content_addressed else filename)
+        return saved
+
+    def _save_content_addressed(self, image_file, filename):
+        ext = os.path.splitext(filename or "")[1].lower()
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.upload_folder, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = image_file.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+            key = digest.hexdigest()
+            dest_path = self.object_path(key)
+            # The write lock on refcounts.db orders this against concurrent deletes
+            with self._lock:
+                self._refs.execute("BEGIN IMMEDIATE")
+                try:
+                    if os.path.exists(dest_path):
+                        os.remove(tmp_path)
+                    else:
+                        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                        os.replace(tmp_path, dest_path)
+                    self._refs.execute("""INSERT INTO refcounts (ref, count) VALUES (?, 1)
+                                          ON CONFLICT(ref) DO UPDATE SET count = count + 1""", (key,))
+                    self._refs.execute("COMMIT")
+                except BaseException:
+                    self._refs.execute("ROLLBACK")
+                    raise
+            return key + ext
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
     def get_image_path(self, filename=None):
         """
         Returns the path to the image.
-        If filename is None or file does not exist, returns the placeholder path.
+        If filename is None, not a reference or plain file name, or the file
+        does not exist, returns the placeholder path.
         :param filename: str or None
         :return: str - path to image or placeholder
         """
-        if not filename:
-            return self.placeholder_path
-        img_path = os.path.join(self.upload_folder, filename)
-        if os.path.exists(img_path):
+        img_path = self._resolve(filename)
+        if img_path and os.path.exists(img_path):
             return img_path
         return self.placeholder_path
 
+    def _resolve(self, filename):
+        # Only refs and plain names inside upload_folder; never paths like "../x" or "/etc/x"
+        if not filename:
+            return None
+        if self.content_addressed and self.is_ref(filename):
+            return self.object_path(filename)
+        if PLAIN_NAME_PATTERN.match(filename) is None:
+            return None
+        return os.path.join(self.upload_folder, filename)
+
     def delete_image(self, filename):
         """
         Deletes an image file if it exists and is not the placeholder.
+        For a content reference this drops one reference; the bytes are
+        removed only when no references remain.
         :param filename: str
         :return: bool - True if deleted, False otherwise
         """
-        img_path = os.path.join(self.upload_folder, filename)
-        if os.path.exists(img_path) and img_path != self.placeholder_path:
+        if self.content_addressed and self.is_ref(filename):
+            return self._release(filename)
+        img_path = self._resolve(filename)
+        if img_path and os.path.exists(img_path) and img_path != self.placeholder_path:
             os.remove(img_path)
             return True
         return False
 
+    def _release(self, ref):
+        ref = self.digest(ref)
+        with self._lock:
+            self._refs.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._refs.execute("SELECT count FROM refcounts WHERE ref = ?", (ref,)).fetchone()
+                if not row:
+                    self._refs.execute("ROLLBACK")
+                    return False
+                removed = row[0] <= 1
+                if removed:
+                    self._refs.execute("DELETE FROM refcounts WHERE ref = ?", (ref,))
+                    img_path = self.object_path(ref)
+                    if os.path.exists(img_path):
+                        os.remove(img_path)
+                else:
+                    self._refs.execute("UPDATE refcounts SET count = count - 1 WHERE ref = ?", (ref,))
+                self._refs.execute("COMMIT")
+            except BaseException:
+                self._refs.execute("ROLLBACK")
+                raise
+            pending = []
+            if removed:
+                for key, (job, owner) in list(self._variant_jobs.items()):
+                    if owner == ref:
+                        del self._variant_jobs[key]
+                        pending.append(job)
+        if removed:
+            self._drop_variants(ref, pending)
+        return True
+
+    def _drop_variants(self, ref, pending):
+        # Outside the lock: a render still running has to finish before its output can go
+        for job in pending:
+            if not job.cancel():
+                try:
+                    job.result()
+                except Exception:
+                    pass
+        shutil.rmtree(self.ref_variants_folder(ref), ignore_errors=True)
+
+    # -- Resized variants --
+    def _variant_key(self, filename, size, fmt):
+        # Returns (source path, variant key, content ref the variant belongs to or None)
+        src = self.get_image_path(filename)
+        ref = None
+        if src == self.placeholder_path and not os.path.exists(src):
+            source_id = "placeholder"
+        elif self.content_addressed and self.is_ref(filename):
+            source_id = ref = self.digest(filename)
+        else:
+            # Flat files can be overwritten in place, so their identity includes mtime and size
+            stat = os.stat(src)
+            source_id = f"{src}:{stat.st_mtime_ns}:{stat.st_size}"
+        raw = f"{source_id}|{size[0]}x{size[1]}|{fmt}".encode()
+        return src, hashlib.sha256(raw).hexdigest(), ref
+
+    def ref_variants_folder(self, ref):
+        # Every variant of a content reference, so they can be removed with it
+        digest = self.digest(ref)
+        return os.path.join(self.variants_folder, "refs", digest[:2], digest)
+
+    def variant_path(self, key, fmt, ref=None):
+        if ref is not None:
+            return os.path.join(self.ref_variants_folder(ref), f"{key}.{fmt}")
+        return os.path.join(self.variants_folder, key[:2], f"{key}.{fmt}")
+
+    def get_variant(self, filename, size, fmt="webp"):
+        """
+        Returns the path to a resized, re-encoded copy of the image, generating
+        it on first request. Missing images get a placeholder of the same size, as
+        do unreadable ones unless placeholder_on_error is off (then
+        UnreadableImageError is raised).
+        :param filename: str or None - as accepted by get_image_path
+        :param size: (width, height) or a VARIANT_SIZES name such as "card"
+        :param fmt: str - a VARIANT_FORMATS key
+        :return: str - path to the cached variant (the original if Pillow is missing)
+        """
+        if Image is None:
+            return self.get_image_path(filename)
+        size = VARIANT_SIZES.get(size, size)
+        return self._submit_variant(filename, size, fmt).result()
+
+    def generate_variants(self, filename, sizes=None, formats=("webp",)):
+        """
+        Queues every size/format variant of the image on the worker pool.
+        :return: list of futures resolving to variant paths
+        """
+        if Image is None:
+            return []
+        sizes = VARIANT_SIZES.values() if sizes is None else sizes
+        return [self._submit_variant(filename, size, fmt) for size in sizes for fmt in formats]
+
+    def _submit_variant(self, filename, size, fmt):
+        src, key, ref = self._variant_key(filename, size, fmt)
+        dest = self.variant_path(key, fmt, ref)
+        submitted = False
+        with self._lock:
+            entry = self._variant_jobs.get(key)
+            if entry is not None:
+                job = entry[0]
+            elif os.path.exists(dest):
+                job = Future()
+                job.set_result(dest)
+            else:
+                # One render per key, however many requests arrive while it runs
+                job = self._variant_pool.submit(self._render_variant, src, dest, size, fmt)
+                self._variant_jobs[key] = (job, ref)
+                submitted = True
+        # A finished job runs its callback inline, and _forget_job takes the lock
+        if submitted:
+            job.add_done_callback(lambda done: self._forget_job(key, done))
+        return job
+
+    def _forget_job(self, key, job):
+        with self._lock:
+            entry = self._variant_jobs.get(key)
+            if entry is not None and entry[0] is job:
+                del self._variant_jobs[key]
+
+    def _render_variant(self, src, dest, size, fmt):
+        pil_format, options = VARIANT_FORMATS[fmt]
+        img = None
+        if os.path.exists(src):
+            try:
+                with Image.open(src) as img:
+                    img = ImageOps.exif_transpose(img)
+                    img = ImageOps.fit(img, size, method=Image.LANCZOS)
+            except (OSError, Image.DecompressionBombError) as e:
+                # Not a decodable image (a renamed file, a truncated upload): render the placeholder
+                if not self.placeholder_on_error:
+                    raise UnreadableImageError(src) from e
+                img = None
+        if img is None:
+            img = Image.new("RGB", size, PLACEHOLDER_COLOR)
+        if pil_format == "JPEG" and img.mode != "RGB":
+            img = img.convert("RGB")
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=".variant-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, format=pil_format, **options)
+            os.replace(tmp_path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return dest
+
     def use_placeholder(self):
         """
         Returns the placeholder image path.
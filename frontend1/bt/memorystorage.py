@@ -1,10 +1,81 @@
+import ast
+import itertools
+import json
+import os
+import queue
 import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.parse import quote
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_READERS = 4
+WRITE_BATCH_SIZE = 256
+BUSY_TIMEOUT_MS = 5000
+HISTORY_FETCH_SIZE = 256
+PRODUCT_COLUMNS = ("id", "owner_email", "title", "desc", "category", "price", "image_url")
+# Copies the product row into the purchase as JSON within the insert itself.
+# A missing product still records the purchase, with a NULL snapshot.
+RECORD_PURCHASE_SQL = '''INSERT INTO purchases (user_email, product_id, timestamp, product_snapshot)
+    SELECT ?1, ?2, ?3, CASE WHEN p.id IS NULL THEN NULL ELSE json_object(
+        'id', p.id, 'owner_email', p.owner_email, 'title', p.title, 'desc', p.desc,
+        'category', p.category, 'price', p.price, 'image_url', p.image_url) END
+    FROM (SELECT 1) LEFT JOIN products p ON p.id = ?2'''
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def decode_snapshot(raw):
+    """Decode a stored product snapshot into a dict.
+    Rows written before snapshots were JSON hold a Python tuple repr."""
+    if raw is None:
+        return None
+    if raw.startswith("{"):
+        return json.loads(raw)
+    try:
+        values = ast.literal_eval(raw)
+    except (ValueError, SyntaxError):
+        return raw
+    if values is None:
+        return None
+    return dict(zip(PRODUCT_COLUMNS, values))
 
 class SQLiteDB:
-    def __init__(self, db_path="app.db"):
-        self.conn = sqlite3.connect(db_path)
+    """SQLite store that is safe to share between threads.
+
+    Reads run on a pool of read-only WAL connections, so they never wait
+    on writers. Writes go through a queue to a single writer thread. The
+    writer commits whatever has queued up in one transaction, so each
+    commit covers several writes. Write methods block until their write
+    is committed; pass wait=False to get a Future instead.
+    """
+
+    def __init__(self, db_path="app.db", readers=DEFAULT_READERS):
+        self.db_path = db_path
+        # A private in-memory database can't be opened a second time, so
+        # readers share the writer's connection under a lock.
+        self.in_memory = db_path in ("", ":memory:")
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        if not self.in_memory:
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
         self.create_tables()
+        self._lock = threading.Lock()
+        self._readers = queue.LifoQueue(maxsize=readers)
+        self._writes = queue.Queue()
+        self._closed = False
+        self._commits = 0
+        self._writes_committed = 0
+        self._writer = threading.Thread(target=self._writer_loop, name="sqlitedb-writer", daemon=True)
+        self._writer.start()
 
     def create_tables(self):
         c = self.conn.cursor()
@@ -44,83 +115,242 @@ class SQLiteDB:
             FOREIGN KEY(user_email) REFERENCES users(email),
             FOREIGN KEY(product_id) REFERENCES products(id)
         )''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_purchases_user_time
+                     ON purchases (user_email, timestamp)''')
         self.conn.commit()
 
-    # -- User methods --
-    def add_user(self, email, username, password_hash):
+    # -- Readers --
+    def _open_reader(self):
+        uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        return conn
+
+    @contextmanager
+    def _reader(self):
+        if self.in_memory:
+            with self._lock:
+                yield self.conn
+            return
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._open_reader()
+        try:
+            yield conn
+        finally:
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _read(self, sql, params=(), fetchone=False):
+        with self._reader() as conn:
+            c = conn.execute(sql, params)
+            return c.fetchone() if fetchone else c.fetchall()
+
+    # -- Writer --
+    def submit_write(self, fn):
+        """Queue fn(cursor) for the writer thread and return a Future for its result.
+        fn runs inside the writer's transaction and must not commit; if it raises,
+        only its own changes are rolled back."""
+        if self._closed:
+            raise RuntimeError("SQLiteDB is closed")
+        future = Future()
+        self._writes.put((fn, future))
+        return future
+
+    def _write(self, fn, wait):
+        future = self.submit_write(fn)
+        return future.result() if wait else future
+
+    def _writer_loop(self):
+        while True:
+            jobs = [self._writes.get()]
+            while len(jobs) < WRITE_BATCH_SIZE:
+                try:
+                    jobs.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in jobs
+            jobs = [job for job in jobs if job is not None and job[1].set_running_or_notify_cancel()]
+            if jobs:
+                with self._lock:
+                    self._commit_batch(jobs)
+            if stop:
+                return
+
+    def _commit_batch(self, jobs):
         c = self.conn.cursor()
+        done = []
         try:
-            c.execute("INSERT INTO users (email, username, password_hash) VALUES (?, ?, ?)",
-                      (email, username, password_hash))
+            c.execute("BEGIN IMMEDIATE")
+            for fn, future in jobs:
+                c.execute("SAVEPOINT write")
+                try:
+                    result = fn(c)
+                except Exception as exc:
+                    c.execute("ROLLBACK TO write")
+                    c.execute("RELEASE write")
+                    future.set_exception(exc)
+                    continue
+                c.execute("RELEASE write")
+                done.append((future, result))
             self.conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
+        except Exception as exc:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            for _, future in jobs:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self._commits += 1
+        self._writes_committed += len(done)
+        # Results are only handed out once the batch is durable
+        for future, result in done:
+            future.set_result(result)
+
+    def stats(self):
+        return {"commits": self._commits, "writes": self._writes_committed,
+                "queued": self._writes.qsize()}
+
+    # -- User methods --
+    def add_user(self, email, username, password_hash, wait=True):
+        def insert(c):
+            try:
+                c.execute("INSERT INTO users (email, username, password_hash) VALUES (?, ?, ?)",
+                          (email, username, password_hash))
+                return True
+            except sqlite3.IntegrityError:
+                return False
+        return self._write(insert, wait)
 
     def get_user(self, email):
-        c = self.conn.cursor()
-        c.execute("SELECT email, username, password_hash FROM users WHERE email = ?", (email,))
-        return c.fetchone()
+        return self._read("SELECT email, username, password_hash FROM users WHERE email = ?",
+                          (email,), fetchone=True)
 
     # -- Product methods --
-    def add_product(self, owner_email, title, desc, category, price, image_url):
-        c = self.conn.cursor()
-        c.execute('''INSERT INTO products (owner_email, title, desc, category, price, image_url)
-                     VALUES (?, ?, ?, ?, ?, ?)''',
-                  (owner_email, title, desc, category, price, image_url))
-        self.conn.commit()
-        return c.lastrowid
+    def add_product(self, owner_email, title, desc, category, price, image_url, wait=True):
+        def insert(c):
+            c.execute('''INSERT INTO products (owner_email, title, desc, category, price, image_url)
+                         VALUES (?, ?, ?, ?, ?, ?)''',
+                      (owner_email, title, desc, category, price, image_url))
+            return c.lastrowid
+        return self._write(insert, wait)
 
     def get_product(self, pid):
-        c = self.conn.cursor()
-        c.execute("SELECT * FROM products WHERE id = ?", (pid,))
-        return c.fetchone()
+        return self._read("SELECT * FROM products WHERE id = ?", (pid,), fetchone=True)
 
     def list_products(self):
-        c = self.conn.cursor()
-        c.execute("SELECT * FROM products")
-        return c.fetchall()
+        return self._read("SELECT * FROM products")
 
     # -- Cart methods --
-    def add_to_cart(self, user_email, product_id, quantity=1):
-        c = self.conn.cursor()
-        c.execute('''INSERT INTO carts (user_email, product_id, quantity)
-                     VALUES (?, ?, ?)
-                     ON CONFLICT(user_email, product_id) DO UPDATE SET quantity=quantity+?''',
-                  (user_email, product_id, quantity, quantity))
-        self.conn.commit()
+    def add_to_cart(self, user_email, product_id, quantity=1, wait=True):
+        def upsert(c):
+            c.execute('''INSERT INTO carts (user_email, product_id, quantity)
+                         VALUES (?, ?, ?)
+                         ON CONFLICT(user_email, product_id) DO UPDATE SET quantity=quantity+?''',
+                      (user_email, product_id, quantity, quantity))
+        return self._write(upsert, wait)
 
     def get_cart(self, user_email):
-        c = self.conn.cursor()
-        c.execute("SELECT product_id, quantity FROM carts WHERE user_email = ?", (user_email,))
-        return c.fetchall()
+        return self._read("SELECT product_id, quantity FROM carts WHERE user_email = ?", (user_email,))
 
-    def remove_from_cart(self, user_email, product_id):
-        c = self.conn.cursor()
-        c.execute("DELETE FROM carts WHERE user_email = ? AND product_id = ?", (user_email, product_id))
-        self.conn.commit()
+    def remove_from_cart(self, user_email, product_id, wait=True):
+        return self._write(lambda c: c.execute("DELETE FROM carts WHERE user_email = ? AND product_id = ?",
+                                               (user_email, product_id)).rowcount, wait)
 
-    def clear_cart(self, user_email):
-        c = self.conn.cursor()
-        c.execute("DELETE FROM carts WHERE user_email = ?", (user_email,))
-        self.conn.commit()
+    def clear_cart(self, user_email, wait=True):
+        return self._write(lambda c: c.execute("DELETE FROM carts WHERE user_email = ?",
+                                               (user_email,)).rowcount, wait)
 
     # -- Purchase methods --
-    def record_purchase(self, user_email, product_id):
-        c = self.conn.cursor()
-        # Take product snapshot as string
-        product = self.get_product(product_id)
-        product_snapshot = str(product)
-        timestamp = datetime.now().isoformat()
-        c.execute('''INSERT INTO purchases (user_email, product_id, timestamp, product_snapshot)
-                     VALUES (?, ?, ?, ?)''',
-                  (user_email, product_id, timestamp, product_snapshot))
-        self.conn.commit()
+    def record_purchase(self, user_email, product_id, wait=True):
+        def insert(c):
+            c.execute(RECORD_PURCHASE_SQL, (user_email, product_id, datetime.now().isoformat()))
+            return c.lastrowid
+        return self._write(insert, wait)
 
-    def get_purchase_history(self, user_email):
-        c = self.conn.cursor()
-        c.execute("SELECT product_snapshot, timestamp FROM purchases WHERE user_email = ?", (user_email,))
-        return c.fetchall()
+    def get_purchase_history(self, user_email, limit=None, since=None):
+        """Yield (product_snapshot, timestamp) oldest first, decoding rows as they are read.
+        since is an ISO timestamp (inclusive); limit caps the number of rows."""
+        # Each batch is its own keyset query, so no reader is held while the caller iterates
+        q = "SELECT product_snapshot, timestamp, id FROM purchases WHERE user_email = ?"
+        params = [user_email]
+        if since is not None:
+            q += " AND timestamp >= ?"
+            params.append(since)
+        remaining = limit
+        after = None
+        while remaining is None or remaining > 0:
+            size = HISTORY_FETCH_SIZE if remaining is None else min(HISTORY_FETCH_SIZE, remaining)
+            page_q, page_params = q, list(params)
+            if after is not None:
+                page_q += " AND (timestamp, id) > (?, ?)"
+                page_params.extend(after)
+            rows = self._read(page_q + " ORDER BY timestamp, id LIMIT ?", page_params + [size])
+            for snapshot, timestamp, _ in rows:
+                yield decode_snapshot(snapshot), timestamp
+            if len(rows) < size:
+                return
+            if remaining is not None:
+                remaining -= len(rows)
+            after = rows[-1][1:]
+
+    # -- Bulk methods --
+    # Each call is a single writer job: its rows stream through executemany in
+    # chunks under one savepoint, so nothing is written if any row fails.
+    def _bulk(self, sql, rows, chunk_size, return_ids=False, wait=True):
+        def insert(c):
+            ids = []
+            before = c.connection.total_changes
+            for chunk in _chunks(rows, chunk_size):
+                c.executemany(sql, chunk)
+                if return_ids:
+                    # AUTOINCREMENT rowids are handed out consecutively while we hold
+                    # the write lock, so the chunk's ids end at last_insert_rowid()
+                    last = c.execute("SELECT last_insert_rowid()").fetchone()[0]
+                    ids.extend(range(last - len(chunk) + 1, last + 1))
+            return ids if return_ids else c.connection.total_changes - before
+        return self._write(insert, wait)
+
+    def add_users_many(self, users, chunk_size=DEFAULT_CHUNK_SIZE, wait=True):
+        """Insert (email, username, password_hash) rows; existing emails are skipped.
+        Returns the number of users added."""
+        return self._bulk("INSERT OR IGNORE INTO users (email, username, password_hash) VALUES (?, ?, ?)",
+                          users, chunk_size, wait=wait)
+
+    def add_products_many(self, products, chunk_size=DEFAULT_CHUNK_SIZE, wait=True):
+        """Insert (owner_email, title, desc, category, price, image_url) rows.
+        Returns the new product ids in input order."""
+        return self._bulk('''INSERT INTO products (owner_email, title, desc, category, price, image_url)
+                             VALUES (?, ?, ?, ?, ?, ?)''',
+                          products, chunk_size, return_ids=True, wait=wait)
+
+    def add_to_cart_many(self, items, chunk_size=DEFAULT_CHUNK_SIZE, wait=True):
+        """Add (user_email, product_id, quantity) lines, summing into existing lines.
+        Returns the number of cart lines written."""
+        return self._bulk('''INSERT INTO carts (user_email, product_id, quantity)
+                             VALUES (?, ?, ?)
+                             ON CONFLICT(user_email, product_id) DO UPDATE SET quantity=quantity+excluded.quantity''',
+                          items, chunk_size, wait=wait)
+
+    def record_purchases_many(self, purchases, chunk_size=DEFAULT_CHUNK_SIZE, wait=True):
+        """Record (user_email, product_id) purchases with product snapshots.
+        Returns the new purchase ids in input order."""
+        rows = ((email, pid, datetime.now().isoformat()) for email, pid in purchases)
+        return self._bulk(RECORD_PURCHASE_SQL, rows, chunk_size, return_ids=True, wait=wait)
 
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        """Commit queued writes, stop the writer and close every connection."""
+        if self._closed:
+            return
+        self._closed = True
+        self._writes.put(None)
+        self._writer.join()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self.conn.close()
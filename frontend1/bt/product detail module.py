@@ -1,25 +1,142 @@
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DB_PATH = 'eco_finds.db'
+CACHE_SIZE = 1024
+CACHE_TTL = 60.0  # seconds; also how long a missing id is remembered
+MAX_IN_PARAMS = 500  # ids per IN (...) query, well under SQLite's variable limit
+
+_MISSING = object()  # cached marker for ids with no product
+
+
+class DetailCache:
+    """Bounded LRU of product details whose entries expire after a TTL.
+
+    Missing ids are cached too, so repeated lookups of deleted products
+    don't reach the database. invalidate() drops entries and bumps a
+    generation counter; a load that started before it is never stored.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # product_id -> (expires_at, details or _MISSING)
+        self._lock = threading.Lock()
+
+    def lookup(self, ids):
+        """Split ids into ({id: cached value}, [ids to load], generation)."""
+        now = time.monotonic()
+        found, todo = {}, []
+        with self._lock:
+            for pid in ids:
+                entry = self._entries.get(pid)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(pid)
+                    found[pid] = entry[1]
+                    self.hits += 1
+                else:
+                    todo.append(pid)
+                    self.misses += 1
+            return found, todo, self.generation
+
+    def store(self, values, generation):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if generation != self.generation:
+                return
+            for pid, value in values.items():
+                self._entries[pid] = (expires_at, value)
+                self._entries.move_to_end(pid)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, ids=None):
+        with self._lock:
+            self.generation += 1
+            if ids is None:
+                self._entries.clear()
+            else:
+                for pid in ids:
+                    self._entries.pop(pid, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "generation": self.generation,
+            }
+
+
+_cache = DetailCache()
+_conn = None
+_conn_lock = threading.Lock()
+
+
+def _details(row):
+    pid, title, category, price, image = row
+    return {
+        "id": pid,
+        "title": title,
+        "category": category,
+        "price": price,
+        "image": image,
+        "description": f"This is a detailed description for {title}."
+    }
+
+
+def _load(ids):
+    # One connection for the life of the process, shared under a lock
+    global _conn
+    rows = []
+    with _conn_lock:
+        if _conn is None:
+            _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        for start in range(0, len(ids), MAX_IN_PARAMS):
+            chunk = ids[start:start + MAX_IN_PARAMS]
+            marks = ",".join("?" * len(chunk))
+            rows.extend(_conn.execute(
+                f"SELECT id, title, category, price, image FROM products WHERE id IN ({marks})",
+                chunk).fetchall())
+    return {row[0]: _details(row) for row in rows}
+
+
+# Function to fetch many products by ID; ids with no product are left out
+def get_product_details_many(ids):
+    ids = list(dict.fromkeys(ids))
+    found, todo, generation = _cache.lookup(ids)
+    if todo:
+        loaded = _load(todo)
+        fresh = {pid: loaded.get(pid, _MISSING) for pid in todo}
+        _cache.store(fresh, generation)
+        found.update(fresh)
+    # Copies, so callers can't change what the cache holds
+    return {pid: dict(found[pid]) for pid in ids if found[pid] is not _MISSING}
+
 
 # Function to fetch a single product by ID
 def get_product_details(product_id):
-    conn = sqlite3.connect('eco_finds.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM products WHERE id=?", (product_id,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        product = {
-            "id": row[0],
-            "title": row[1],
-            "category": row[2],
-            "price": row[3],
-            "image": row[4],
-            "description": f"This is a detailed description for {row[1]}."
-        }
-        return product
-    else:
-        return None
+    return get_product_details_many([product_id]).get(product_id)
+
+
+# Product writers call this after creating, updating or deleting products.
+# New ids need it too: an earlier lookup may have cached them as missing.
+def invalidate_product_details(product_ids=None):
+    _cache.invalidate(None if product_ids is None else list(product_ids))
+
+
+def cache_stats():
+    return _cache.stats()
+
 
 # Example usage
 if __name__ == "__main__":
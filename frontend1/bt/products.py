@@ -1,4 +1,6 @@
-from typing import List, Dict, Optional
+import bisect
+import math
+from typing import List, Dict, Optional, Set, Tuple
 
 # Simple product data structure
 class Product:
@@ -27,6 +29,32 @@ products: Dict[int, Product] = {}
 categories: List[str] = ['Electronics', 'Clothing', 'Books', 'Home', 'Other']
 next_product_id = 1
 
+# Secondary indexes, kept in step with `products` by create/update/delete
+products_by_category: Dict[str, Set[int]] = {}
+products_by_owner: Dict[str, Set[int]] = {}
+price_index: List[Tuple[float, int]] = []  # sorted (price, id)
+
+def _index_product(prod: Product) -> None:
+    products_by_category.setdefault(prod.category, set()).add(prod.id)
+    products_by_owner.setdefault(prod.owner, set()).add(prod.id)
+    bisect.insort(price_index, (prod.price, prod.id))
+
+def _unindex_product(prod: Product) -> None:
+    for index, key in ((products_by_category, prod.category), (products_by_owner, prod.owner)):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(prod.id)
+            if not ids:
+                del index[key]
+    i = bisect.bisect_left(price_index, (prod.price, prod.id))
+    if i < len(price_index) and price_index[i] == (prod.price, prod.id):
+        del price_index[i]
+
+def _price_range(min_price: Optional[float], max_price: Optional[float]) -> Tuple[int, int]:
+    lo = 0 if min_price is None else bisect.bisect_left(price_index, (min_price, -math.inf))
+    hi = len(price_index) if max_price is None else bisect.bisect_right(price_index, (max_price, math.inf))
+    return lo, max(lo, hi)
+
 # CREATE
 def create_product(title: str, description: str, category: str, price: float, owner: str) -> Product:
     global next_product_id
@@ -34,16 +62,38 @@ def create_product(title: str, description: str, category: str, price: float, ow
         raise ValueError("Invalid category")
     prod = Product(next_product_id, title, description, category, price, owner)
     products[next_product_id] = prod
+    _index_product(prod)
     next_product_id += 1
     return prod
 
 # READ ALL (optionally filtered)
-def list_products(category: Optional[str] = None, search: Optional[str] = None) -> List[Product]:
-    result = list(products.values())
+def list_products(category: Optional[str] = None, search: Optional[str] = None,
+                  min_price: Optional[float] = None, max_price: Optional[float] = None,
+                  owner: Optional[str] = None) -> List[Product]:
+    # Walk the smallest matching index and probe the others, instead of scanning every product
+    id_sets = []
     if category:
-        result = [p for p in result if p.category == category]
+        id_sets.append(products_by_category.get(category, set()))
+    if owner:
+        id_sets.append(products_by_owner.get(owner, set()))
+    priced = min_price is not None or max_price is not None
+    if priced:
+        lo, hi = _price_range(min_price, max_price)
+    if not id_sets and not priced:
+        ids = list(products)
+    elif priced and (not id_sets or hi - lo <= min(len(s) for s in id_sets)):
+        ids = sorted(pid for _, pid in price_index[lo:hi] if all(pid in s for s in id_sets))
+    else:
+        id_sets.sort(key=len)
+        smallest, others = id_sets[0], id_sets[1:]
+        ids = sorted(pid for pid in smallest
+                     if all(pid in s for s in others)
+                     and (min_price is None or products[pid].price >= min_price)
+                     and (max_price is None or products[pid].price <= max_price))
+    result = [products[pid] for pid in ids]
     if search:
-        result = [p for p in result if search.lower() in p.title.lower()]
+        needle = search.lower()
+        result = [p for p in result if needle in p.title.lower()]
     return result
 
 # READ ONE
@@ -57,10 +107,12 @@ def update_product(product_id: int, title: str, description: str, category: str,
         return None
     if category not in categories:
         raise ValueError("Invalid category")
+    _unindex_product(prod)
     prod.title = title
     prod.description = description
     prod.category = category
     prod.price = price
+    _index_product(prod)
     return prod
 
 # DELETE
@@ -69,6 +121,7 @@ def delete_product(product_id: int, owner: str) -> bool:
     if not prod or prod.owner != owner:
         return False
     del products[product_id]
+    _unindex_product(prod)
     return True
 
 # Example usage
@@ -82,6 +135,9 @@ if __name__ == "__main__":
     print([p.to_dict() for p in list_products(category="Home")])
     # Search
     print([p.to_dict() for p in list_products(search="T-shirt")])
+    # Price range and owner
+    print([p.to_dict() for p in list_products(min_price=200, max_price=300)])
+    print([p.to_dict() for p in list_products(owner="bob@example.com")])
     # Update
     update_product(p1.id, "Eco Bottle", "Reusable updated bottle", "Home", 299.0, "alice@example.com")
     print(get_product(p1.id).to_dict())
@@ -1,16 +1,214 @@
-from flask import Flask, request, session, jsonify
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import Flask, request, session, jsonify, send_file
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.utils import secure_filename
+from imagehandler import ImageHandler, UnreadableImageError, VARIANT_FORMATS, VARIANT_SIZES
 
 app = Flask(__name__)
 app.secret_key = 'supersecretkey'  # Change for production!
 
+# Password hashing runs off the request thread. HASH_WORKERS=0 hashes inline.
+app.config['HASH_WORKERS'] = int(os.environ.get('HASH_WORKERS', os.cpu_count() or 1))
+app.config['HASH_MAX_PENDING'] = int(os.environ.get('HASH_MAX_PENDING', 64))
+app.config['HASH_TIMEOUT'] = float(os.environ.get('HASH_TIMEOUT', 5.0))
+
+# Image serving. USE_X_SENDFILE hands file transfer to a fronting nginx/Apache;
+# otherwise the WSGI server's file_wrapper (sendfile) streams the bytes.
+app.config['IMAGE_FOLDER'] = os.environ.get('IMAGE_FOLDER', 'uploaded_images')
+app.config['IMAGE_MAX_AGE'] = int(os.environ.get('IMAGE_MAX_AGE', 365 * 24 * 3600))
+app.config['IMAGE_META_CACHE_SIZE'] = int(os.environ.get('IMAGE_META_CACHE_SIZE', 4096))
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '') == '1'
+
 # In-memory user store: {email: {username, password_hash}}
 users = {}
 
+class HashUnavailable(Exception):
+    pass
+
+class HashPool:
+    """Bounded process pool for CPU-bound password hashing."""
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Created lazily so worker processes start after the app is configured
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _call(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashUnavailable('Too many pending password operations')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HashUnavailable('Password operation timed out')
+
+    def generate(self, password):
+        return self._call(generate_password_hash, password)
+
+    def check(self, pwhash, password):
+        return self._call(check_password_hash, pwhash, password)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+hash_pool = HashPool(app.config['HASH_WORKERS'], app.config['HASH_MAX_PENDING'], app.config['HASH_TIMEOUT'])
+
+@app.errorhandler(HashUnavailable)
+def hash_unavailable(e):
+    return jsonify({'success': False, 'error': 'Server busy, try again'}), 503
+
 def get_current_user():
     email = session.get('user_email')
     return users.get(email)
 
+class ImageMetaCache:
+    """LRU of resolved image paths and strong ETags, so serving skips path lookups and rehashing."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            meta = self._entries.get(key)
+            if meta is not None:
+                self._entries.move_to_end(key)
+            return meta
+
+    def put(self, key, meta):
+        with self._lock:
+            self._entries[key] = meta
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+image_meta = ImageMetaCache(app.config['IMAGE_META_CACHE_SIZE'])
+
+_images = None
+_images_lock = threading.Lock()
+
+def get_images():
+    # Created on first use, so importing the app touches no files. The folder is made
+    # absolute: send_file resolves relative paths against app.root_path, not the cwd.
+    global _images
+    with _images_lock:
+        if _images is None:
+            # Unreadable uploads are reported to the client rather than served as placeholders
+            _images = ImageHandler(upload_folder=os.path.abspath(app.config['IMAGE_FOLDER']),
+                                   content_addressed=True, placeholder_on_error=False)
+        return _images
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def resolve_image(name, size=None, fmt='webp'):
+    """
+    Returns (path, etag, immutable) for an image or one of its variants, or None.
+    Content references (and their variants) never change, so their entries are
+    trusted without touching the disk; plain files are re-validated with one stat.
+    """
+    key = (name, size, fmt)
+    meta = image_meta.get(key)
+    if meta is not None:
+        path, etag, immutable, source, stamp = meta
+        if immutable:
+            return path, etag, immutable
+        try:
+            if _stamp(source) == stamp:
+                return path, etag, immutable
+        except FileNotFoundError:
+            image_meta.discard(key)
+            return None
+    images = get_images()
+    source = images.get_image_path(name)
+    if source == images.placeholder_path:
+        return None
+    immutable = images.is_ref(name)
+    stamp = None if immutable else _stamp(source)
+    if size:
+        path = images.get_variant(name, size, fmt)
+        if path == source:
+            return None  # Pillow is not installed; do not pass originals off as variants
+        # Variant files are named by a hash of (source identity, size, format)
+        etag = os.path.splitext(os.path.basename(path))[0]
+    else:
+        path = source
+        etag = os.path.splitext(name)[0] if immutable else _file_digest(path)
+    image_meta.put(key, (path, etag, immutable, source, stamp))
+    return path, etag, immutable
+
+@app.route('/api/images/<name>')
+def serve_image(name):
+    size = request.args.get('size')
+    fmt = request.args.get('format', 'webp')
+    # Only content references and plain file names; never paths
+    if not (get_images().is_ref(name) or name == secure_filename(name)):
+        return jsonify({'success': False, 'error': 'Image not found'}), 404
+    if (size is not None and size not in VARIANT_SIZES) or fmt not in VARIANT_FORMATS:
+        return jsonify({'success': False, 'error': 'Unknown image size or format'}), 400
+    try:
+        resolved = resolve_image(name, size, fmt)
+    except UnreadableImageError:
+        return jsonify({'success': False, 'error': 'Unsupported image'}), 415
+    except OSError:
+        # The source went away or could not be read while its variant rendered
+        image_meta.discard((name, size, fmt))
+        return jsonify({'success': False, 'error': 'Image not found'}), 404
+    if resolved is None:
+        return jsonify({'success': False, 'error': 'Image not found'}), 404
+    path, etag, immutable = resolved
+    # Stored objects are named by digest alone; the type comes from the requested name
+    mimetype = None if size else mimetypes.guess_type(name)[0]
+    try:
+        # conditional=True answers If-None-Match / If-Modified-Since with 304 and Range with 206
+        resp = send_file(path, mimetype=mimetype, conditional=True, etag=etag,
+                         max_age=app.config['IMAGE_MAX_AGE'])
+    except FileNotFoundError:
+        image_meta.discard((name, size, fmt))
+        return jsonify({'success': False, 'error': 'Image not found'}), 404
+    resp.cache_control.public = True
+    if immutable:
+        resp.cache_control.immutable = True
+    return resp
+
 @app.route('/api/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -21,10 +219,13 @@ def register():
         return jsonify({'success': False, 'error': 'Missing fields'}), 400
     if email in users:
         return jsonify({'success': False, 'error': 'Email already registered'}), 409
-    users[email] = {
+    record = {
         'username': username,
-        'password_hash': generate_password_hash(password)
+        'password_hash': hash_pool.generate(password)
     }
+    # Another request may have registered the email while we were hashing
+    if users.setdefault(email, record) is not record:
+        return jsonify({'success': False, 'error': 'Email already registered'}), 409
     session['user_email'] = email
     return jsonify({'success': True, 'message': 'Registered', 'username': username})
 
@@ -34,7 +235,7 @@ def login():
     email = data.get('email', '').lower().strip()
     password = data.get('password', '')
     user = users.get(email)
-    if not user or not check_password_hash(user['password_hash'], password):
+    if not user or not hash_pool.check(user['password_hash'], password):
         return jsonify({'success': False, 'error': 'Invalid credentials'}), 401
     session['user_email'] = email
     return jsonify({'success': True, 'message': 'Logged in', 'username': user['username']})
@@ -67,11 +268,11 @@ def change_password():
     data = request.get_json()
     old_pw = data.get('old_password', '')
     new_pw = data.get('new_password', '')
-    if not check_password_hash(user['password_hash'], old_pw):
+    if not hash_pool.check(user['password_hash'], old_pw):
         return jsonify({'success': False, 'error': 'Current password incorrect'}), 403
     if not new_pw:
         return jsonify({'success': False, 'error': 'New password required'}), 400
-    user['password_hash'] = generate_password_hash(new_pw)
+    user['password_hash'] = hash_pool.generate(new_pw)
     return jsonify({'success': True, 'message': 'Password changed'})
 
 if __name__ == '__main__':
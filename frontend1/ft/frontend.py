@@ -2,52 +2,396 @@
 import streamlit as st
 import sqlite3
 import hashlib
+import base64
+import bisect
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache, partial
 from datetime import datetime
 
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Backend modules live in bt/, next to this script or one level up
+for _bt_dir in (os.path.join(APP_DIR, "bt"), os.path.join(APP_DIR, os.pardir, "bt")):
+    if os.path.isdir(_bt_dir):
+        if _bt_dir not in sys.path:
+            sys.path.append(_bt_dir)
+        break
+from imagehandler import ImageHandler, VARIANT_SIZES
+
 DB_PATH = "eco_finds.db"
+UPLOAD_FOLDER = "uploaded_images"
+REMOTE_PLACEHOLDER = "https://via.placeholder.com/{w}x{h}?text=Image"
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 256
+DB_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),      # KiB, i.e. ~16 MB page cache per connection
+    ("mmap_size", 268435456),
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+)
+CATALOG_CACHE_SIZE = 512
+CART_FLUSH_SECONDS = 2.0
+SLOW_QUERY_MS = float(os.environ.get("ECOFINDS_SLOW_QUERY_MS", 50))
+SLOW_LOG_SIZE = 200
+# Upper bounds of the per-fingerprint latency buckets, in milliseconds
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf"))
+# Upper edges of the price buckets kept in product_facets; the last bucket is open-ended.
+# Baked into the facet triggers by migration 5, so changing them needs a new migration.
+PRICE_BUCKET_EDGES = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+ADMIN_EMAILS = {e.strip().lower() for e in os.environ.get("ECOFINDS_ADMINS", "").split(",") if e.strip()}
 
 # ---------------------------
 # Utilities: DB + Security
 # ---------------------------
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection that times execute(), executemany(), fetch() and commit() into stats.
+
+    Pooled connections get the app's QueryStats, so run(), transaction(),
+    SessionCart, migrations and seeding are all recorded. Without stats
+    (the bench loader) nothing is recorded.
+    """
+    stats = None
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        cur = super().execute(sql, parameters)
+        self._record(sql, parameters, start, max(cur.rowcount, 0))
+        return cur
+
+    def executemany(self, sql, seq_of_parameters):
+        rows = seq_of_parameters if isinstance(seq_of_parameters, (list, tuple)) else list(seq_of_parameters)
+        start = time.perf_counter()
+        cur = super().executemany(sql, rows)
+        self._record(sql, rows[0] if rows else None, start, max(cur.rowcount, 0))
+        return cur
+
+    def fetch(self, sql, parameters=(), one=False):
+        """Run a query and fetch all rows (or the first, if one); timed and counted together."""
+        start = time.perf_counter()
+        cur = super().execute(sql, parameters)
+        result = cur.fetchone() if one else cur.fetchall()
+        self._record(sql, parameters, start, int(result is not None) if one else len(result))
+        return result
+
+    def commit(self):
+        start = time.perf_counter()
+        super().commit()
+        self._record("COMMIT", None, start, 0)
+
+    def _record(self, sql, parameters, start, rows):
+        if self.stats is None:
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if self.stats.record(sql, elapsed_ms, rows):
+            plan = query_plan(self, sql, parameters) if parameters is not None else []
+            self.stats.log_slow(sql, elapsed_ms, rows, plan)
+
+def open_conn(path=None, stats=None):
+    conn = sqlite3.connect(path or DB_PATH, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE, factory=InstrumentedConnection)
+    for name, value in DB_PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    conn.stats = stats
+    return conn
+
+class ConnectionPool:
+    """Process-wide pool of tuned connections; one borrower per connection at a time."""
+
+    def __init__(self, path, size=POOL_SIZE, stats=None):
+        self.path = path
+        self.stats = stats
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = open_conn(self.path, self.stats)
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+# Streamlit re-executes this script on every interaction; cache_resource keeps
+# the pool alive across reruns and sessions.
+@st.cache_resource
+def get_pool():
+    return ConnectionPool(DB_PATH, stats=get_query_stats())
+
 def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    return get_pool().connection()
 
 def run(query, params=(), fetchone=False, fetchall=False, commit=False):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(query, params)
-    if commit:
+    with get_conn() as conn:
+        result = None
+        if fetchone or fetchall:
+            result = conn.fetch(query, params, one=fetchone)
+        else:
+            conn.execute(query, params)
+        if commit:
+            conn.commit()
+        return result
+
+@contextmanager
+def transaction():
+    # One write transaction on one pooled connection; rolled back on error.
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        yield conn
         conn.commit()
-    if fetchone:
-        r = cur.fetchone()
-        conn.close()
-        return r
-    if fetchall:
-        r = cur.fetchall()
-        conn.close()
-        return r
-    conn.close()
-    return None
+
+# ---------------------------
+# Query instrumentation
+# ---------------------------
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+@lru_cache(maxsize=1024)
+def fingerprint(query):
+    """Normalize a statement so calls differing only in values share one key."""
+    fp = _STRING_LITERAL.sub("?", query)
+    fp = _NUMBER_LITERAL.sub("?", fp)
+    fp = " ".join(fp.split())
+    return _IN_LIST.sub("(?+)", fp)
+
+def query_plan(conn, query, params=()):
+    # EXPLAIN QUERY PLAN rows are (id, parent, notused, detail); indent by depth.
+    # Runs uninstrumented so explaining a slow statement is not itself recorded.
+    try:
+        steps = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + query, params).fetchall()
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in steps:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+class QueryStats:
+    """Per-fingerprint call counts, rows and latency histograms for pooled statements.
+
+    Statements at or above slow_ms are also kept, with their query plan,
+    in a bounded slow-query log. Shared by every session.
+    """
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, log_size=SLOW_LOG_SIZE):
+        self.slow_ms = slow_ms
+        self.since = datetime.utcnow().isoformat()
+        self._by_fp = {}
+        self._slow = deque(maxlen=log_size)
+        self._lock = threading.Lock()
+
+    def record(self, query, elapsed_ms, rows):
+        """Count one call; returns True if it belongs in the slow-query log."""
+        fp = fingerprint(query)
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+        with self._lock:
+            entry = self._by_fp.get(fp)
+            if entry is None:
+                entry = self._by_fp[fp] = {"calls": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                           "slow": 0, "buckets": [0] * len(LATENCY_BUCKETS_MS)}
+            entry["calls"] += 1
+            entry["rows"] += rows
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["buckets"][bucket] += 1
+            slow = elapsed_ms >= self.slow_ms
+            entry["slow"] += slow
+            return slow
+
+    def log_slow(self, query, elapsed_ms, rows, plan):
+        # Parameters are left out: they can hold emails and password hashes
+        with self._lock:
+            self._slow.append({"at": datetime.utcnow().isoformat(), "fingerprint": fingerprint(query),
+                               "elapsed_ms": round(elapsed_ms, 3), "rows": rows, "plan": plan})
+
+    @staticmethod
+    def _quantile(buckets, calls, max_ms, q):
+        # Upper bound of the bucket holding the q-th call, capped by the slowest call
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, buckets):
+            seen += count
+            if seen >= q * calls:
+                return min(bound, max_ms)
+        return max_ms
+
+    def queries(self):
+        """One summary per fingerprint, most total time first."""
+        with self._lock:
+            items = [(fp, dict(e, buckets=list(e["buckets"]))) for fp, e in self._by_fp.items()]
+        out = []
+        for fp, e in items:
+            calls = e["calls"]
+            out.append({
+                "fingerprint": fp,
+                "id": hashlib.blake2b(fp.encode(), digest_size=4).hexdigest(),
+                "calls": calls,
+                "rows": e["rows"],
+                "rows_per_call": e["rows"] / calls,
+                "total_ms": e["total_ms"],
+                "mean_ms": e["total_ms"] / calls,
+                "p50_ms": self._quantile(e["buckets"], calls, e["max_ms"], 0.50),
+                "p95_ms": self._quantile(e["buckets"], calls, e["max_ms"], 0.95),
+                "p99_ms": self._quantile(e["buckets"], calls, e["max_ms"], 0.99),
+                "max_ms": e["max_ms"],
+                "slow": e["slow"],
+                "histogram": {("inf" if b == float("inf") else str(b)): n
+                              for b, n in zip(LATENCY_BUCKETS_MS, e["buckets"])},
+            })
+        out.sort(key=lambda q: q["total_ms"], reverse=True)
+        return out
+
+    def slow_log(self):
+        with self._lock:
+            return list(self._slow)
+
+    def snapshot(self):
+        """Everything as plain JSON-serializable data."""
+        return {"since": self.since, "taken": datetime.utcnow().isoformat(),
+                "slow_ms": self.slow_ms, "bucket_bounds_ms": [str(b) for b in LATENCY_BUCKETS_MS],
+                "queries": self.queries(), "slow_log": self.slow_log()}
+
+    def reset(self):
+        with self._lock:
+            self.since = datetime.utcnow().isoformat()
+            self._by_fp.clear()
+            self._slow.clear()
+
+@st.cache_resource
+def get_query_stats():
+    return QueryStats()
+
+def is_admin(user):
+    return bool(user) and (user.get("email") or "").lower() in ADMIN_EMAILS
+
+# ---------------------------
+# Catalog read cache
+# ---------------------------
+class CatalogCache:
+    """Process-wide LRU of catalog reads, invalidated by a generation counter.
+
+    Product writes call bump(); a load that started before a bump is returned
+    to its caller but never stored. Cached results are shared by every
+    session, so callers must not mutate them.
+    """
+
+    def __init__(self, maxsize=CATALOG_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            generation = self.generation
+        value = loader()
+        with self._lock:
+            if generation == self.generation:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def bump(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "generation": self.generation,
+            }
+
+@st.cache_resource
+def get_catalog_cache():
+    return CatalogCache()
+
+# ---------------------------
+# Listing images
+# ---------------------------
+@st.cache_resource
+def get_image_handler():
+    return ImageHandler(upload_folder=UPLOAD_FOLDER, content_addressed=True, eager_variants=True)
+
+def listing_image(image, size):
+    # Pre-sized local variant ("card"/"detail"); URLs pass through unchanged
+    if image and image.startswith(("http://", "https://")):
+        return image
+    path = get_image_handler().get_variant(image, size)
+    if os.path.exists(path):
+        return path
+    w, h = VARIANT_SIZES[size]
+    return REMOTE_PLACEHOLDER.format(w=w, h=h)
 
 def hash_pwd(pw: str) -> str:
     return hashlib.sha256(pw.encode()).hexdigest()
 
-def init_db():
-    run("""
+# ---------------------------
+# Schema migrations
+# ---------------------------
+# Each step runs once, in order, inside the same transaction that records it
+# in schema_version. Append new steps; never edit one that has shipped.
+def _m001_base_tables(conn):
+    conn.execute("""
     CREATE TABLE IF NOT EXISTS users(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         email TEXT UNIQUE NOT NULL,
         password_hash TEXT NOT NULL,
         username TEXT
-    )""", commit=True)
+    )""")
 
-    run("""
+    conn.execute("""
     CREATE TABLE IF NOT EXISTS categories(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT UNIQUE NOT NULL
-    )""", commit=True)
+    )""")
 
-    run("""
+    conn.execute("""
     CREATE TABLE IF NOT EXISTS products(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id INTEGER NOT NULL,
@@ -58,25 +402,25 @@ def init_db():
         image TEXT,
         created_at TEXT,
         FOREIGN KEY(user_id) REFERENCES users(id)
-    )""", commit=True)
+    )""")
 
-    run("""
+    conn.execute("""
     CREATE TABLE IF NOT EXISTS cart(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id INTEGER NOT NULL,
         product_id INTEGER NOT NULL,
         quantity INTEGER NOT NULL DEFAULT 1,
         UNIQUE(user_id, product_id)
-    )""", commit=True)
+    )""")
 
-    run("""
+    conn.execute("""
     CREATE TABLE IF NOT EXISTS orders(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         user_id INTEGER NOT NULL,
         created_at TEXT NOT NULL
-    )""", commit=True)
+    )""")
 
-    run("""
+    conn.execute("""
     CREATE TABLE IF NOT EXISTS order_items(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         order_id INTEGER NOT NULL,
@@ -84,19 +428,211 @@ def init_db():
         title TEXT,
         price REAL,
         quantity INTEGER NOT NULL
-    )""", commit=True)
+    )""")
 
-    # Seed categories
+def _m002_seed_categories(conn):
     default_cats = [
         "Clothes","Books","Electronics","Furniture","Accessories",
         "Sports Equipment","Home Decor","Beauty & Personal Care",
         "Toys & Games","Kitchenware"
     ]
-    for c in default_cats:
-        run("INSERT OR IGNORE INTO categories(name) VALUES(?)", (c,), commit=True)
+    conn.executemany("INSERT OR IGNORE INTO categories(name) VALUES(?)", [(c,) for c in default_cats])
+
+def _m003_products_fts(conn):
+    # Full-text index over title + description; triggers keep it in step with products
+    conn.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        title, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF title, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO products_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""")
+    conn.execute("INSERT INTO products_fts(products_fts) VALUES('rebuild')")
+
+def _m004_browse_indexes(conn):
+    # Filtered browsing and per-seller listings. Browse pages are ordered by id,
+    # so the index walks each category in keyset order and checks the price
+    # range inside the index; (category, price, id) would sort every match.
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_products_category_id
+                    ON products(category, id, price)""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_products_user_created
+                    ON products(user_id, created_at)""")
+
+def price_bucket_sql(col):
+    # SQL for the PRICE_BUCKET_EDGES bucket of a price expression
+    whens = " ".join(f"WHEN {col} < {edge} THEN {i}" for i, edge in enumerate(PRICE_BUCKET_EDGES))
+    return f"(CASE {whens} ELSE {len(PRICE_BUCKET_EDGES)} END)"
+
+def rebuild_facets(conn):
+    # Recount product_facets from scratch; the triggers keep it current afterwards
+    conn.execute("DELETE FROM product_facets")
+    conn.execute(f"""INSERT INTO product_facets(category, bucket, listings)
+                     SELECT category, {price_bucket_sql("price")}, COUNT(*)
+                     FROM products GROUP BY 1, 2""")
+
+def _m005_product_facets(conn):
+    # Listings per (category, price bucket), so the Browse filters never scan products
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS product_facets(
+        category TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        listings INTEGER NOT NULL,
+        PRIMARY KEY(category, bucket)
+    ) WITHOUT ROWID""")
+    add = f"""INSERT INTO product_facets(category, bucket, listings)
+              VALUES (new.category, {price_bucket_sql("new.price")}, 1)
+              ON CONFLICT(category, bucket) DO UPDATE SET listings=listings+1;"""
+    remove = f"""UPDATE product_facets SET listings=listings-1
+                 WHERE category=old.category AND bucket={price_bucket_sql("old.price")};
+                 DELETE FROM product_facets WHERE category=old.category AND listings<=0;"""
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS product_facets_ai AFTER INSERT ON products BEGIN {add} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS product_facets_ad AFTER DELETE ON products BEGIN {remove} END")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS product_facets_au
+                     AFTER UPDATE OF category, price ON products BEGIN {remove} {add} END""")
+    rebuild_facets(conn)
+
+USER_STATS_COLUMNS = ("listings", "cart_items", "orders", "spend")
 
+def _bump_user_stats(user_id, column, delta):
+    # Trigger statement adding delta to one user_stats counter, creating the row if needed
+    return f"""INSERT INTO user_stats(user_id, {column}) VALUES ({user_id}, {delta})
+               ON CONFLICT(user_id) DO UPDATE SET {column}={column}+excluded.{column};"""
+
+def rebuild_user_stats(conn):
+    # Recount user_stats from scratch; the triggers keep it current afterwards
+    conn.execute("DELETE FROM user_stats")
+    conn.execute("""INSERT INTO user_stats(user_id, listings, cart_items, orders, spend)
+                    SELECT user_id, SUM(l), SUM(c), SUM(o), SUM(s) FROM (
+                        SELECT user_id, COUNT(*) AS l, 0 AS c, 0 AS o, 0.0 AS s FROM products GROUP BY user_id
+                        UNION ALL SELECT user_id, 0, SUM(quantity), 0, 0.0 FROM cart GROUP BY user_id
+                        UNION ALL SELECT user_id, 0, 0, COUNT(*), 0.0 FROM orders GROUP BY user_id
+                        UNION ALL SELECT o.user_id, 0, 0, 0, SUM(oi.price*oi.quantity)
+                                  FROM order_items oi JOIN orders o ON o.id=oi.order_id GROUP BY o.user_id
+                    ) GROUP BY user_id""")
+
+def _m006_user_stats(conn):
+    # Per-user Dashboard counters, kept in the same transaction as the write that changes them
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_stats(
+        user_id INTEGER PRIMARY KEY,
+        listings INTEGER NOT NULL DEFAULT 0,
+        cart_items INTEGER NOT NULL DEFAULT 0,
+        orders INTEGER NOT NULL DEFAULT 0,
+        spend REAL NOT NULL DEFAULT 0
+    )""")
+    order_user = "(SELECT user_id FROM orders WHERE id={}.order_id)"
+    triggers = {
+        "user_stats_products_ai": ("AFTER INSERT ON products",
+                                   _bump_user_stats("new.user_id", "listings", 1)),
+        "user_stats_products_ad": ("AFTER DELETE ON products",
+                                   _bump_user_stats("old.user_id", "listings", -1)),
+        "user_stats_products_au": ("AFTER UPDATE OF user_id ON products",
+                                   _bump_user_stats("old.user_id", "listings", -1)
+                                   + _bump_user_stats("new.user_id", "listings", 1)),
+        "user_stats_cart_ai": ("AFTER INSERT ON cart",
+                               _bump_user_stats("new.user_id", "cart_items", "new.quantity")),
+        "user_stats_cart_ad": ("AFTER DELETE ON cart",
+                               _bump_user_stats("old.user_id", "cart_items", "-old.quantity")),
+        "user_stats_cart_au": ("AFTER UPDATE OF user_id, quantity ON cart",
+                               _bump_user_stats("old.user_id", "cart_items", "-old.quantity")
+                               + _bump_user_stats("new.user_id", "cart_items", "new.quantity")),
+        "user_stats_orders_ai": ("AFTER INSERT ON orders",
+                                 _bump_user_stats("new.user_id", "orders", 1)),
+        "user_stats_orders_ad": ("AFTER DELETE ON orders",
+                                 _bump_user_stats("old.user_id", "orders", -1)),
+        "user_stats_order_items_ai": ("AFTER INSERT ON order_items",
+                                      _bump_user_stats(order_user.format("new"), "spend",
+                                                       "new.price*new.quantity")),
+        "user_stats_order_items_ad": ("AFTER DELETE ON order_items",
+                                      _bump_user_stats(order_user.format("old"), "spend",
+                                                       "-old.price*old.quantity")),
+        "user_stats_order_items_au": ("AFTER UPDATE OF order_id, price, quantity ON order_items",
+                                      _bump_user_stats(order_user.format("old"), "spend",
+                                                       "-old.price*old.quantity")
+                                      + _bump_user_stats(order_user.format("new"), "spend",
+                                                         "new.price*new.quantity")),
+    }
+    for name, (event, body) in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+    rebuild_user_stats(conn)
+
+def rebuild_order_totals(conn):
+    # Recompute the stored order totals from their items
+    conn.execute("""UPDATE orders SET
+                        total=COALESCE((SELECT SUM(price*quantity) FROM order_items WHERE order_id=orders.id), 0),
+                        item_count=COALESCE((SELECT SUM(quantity) FROM order_items WHERE order_id=orders.id), 0)""")
+
+def _m007_order_totals(conn):
+    # Totals are written by checkout(), so order history never re-aggregates its items
+    conn.execute("ALTER TABLE orders ADD COLUMN total REAL NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE orders ADD COLUMN item_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id)")
+    rebuild_order_totals(conn)
+
+MIGRATIONS = [
+    (1, "base tables", _m001_base_tables),
+    (2, "seed categories", _m002_seed_categories),
+    (3, "products full-text index", _m003_products_fts),
+    (4, "browse indexes", _m004_browse_indexes),
+    (5, "product facets", _m005_product_facets),
+    (6, "user stats", _m006_user_stats),
+    (7, "order totals", _m007_order_totals),
+]
+
+def schema_version(conn):
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def migrate(conn):
+    # Steps from before schema_version existed use IF NOT EXISTS, so databases
+    # created by the old init_db() upgrade in place.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version(
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    )""")
+    conn.commit()
+    if schema_version(conn) >= MIGRATIONS[-1][0]:
+        return []
+    applied = []
+    # BEGIN IMMEDIATE serializes concurrent processes; re-read the version under the lock
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = schema_version(conn)
+        for version, name, step in MIGRATIONS:
+            if version <= current:
+                continue
+            step(conn)
+            conn.execute("INSERT INTO schema_version(version, name, applied_at) VALUES(?,?,?)",
+                         (version, name, datetime.utcnow().isoformat()))
+            applied.append(version)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return applied
+
+def seed_demo_products(conn):
     # Seed a few demo products for browsing (owned by no user until someone creates—use user_id 1 if exists)
-    user1 = run("SELECT id FROM users WHERE id=1", fetchone=True)
+    user1 = conn.execute("SELECT id FROM users WHERE id=1").fetchone()
     owner = user1[0] if user1 else None
     demo = [
         ("Leather Jacket","Gently used leather jacket.","Clothes",120.0,"placeholder.jpg"),
@@ -106,12 +642,25 @@ def init_db():
         ("Yoga Mat","Like new.","Sports Equipment",20.0,"placeholder.jpg"),
     ]
     if owner:
-        existing = run("SELECT COUNT(*) FROM products", fetchone=True)
-        if existing and existing[0] == 0:
+        # Stops at the first row; COUNT(*) would scan the whole catalog to test emptiness
+        if conn.execute("SELECT 1 FROM products LIMIT 1").fetchone() is None:
             now = datetime.utcnow().isoformat()
-            for t,d,cat,p,img in demo:
-                run("""INSERT INTO products(user_id,title,description,category,price,image,created_at)
-                       VALUES(?,?,?,?,?,?,?)""",(owner,t,d,cat,p,img,now), commit=True)
+            conn.executemany("""INSERT INTO products(user_id,title,description,category,price,image,created_at)
+                                VALUES(?,?,?,?,?,?,?)""",
+                             [(owner,t,d,cat,p,img,now) for t,d,cat,p,img in demo])
+            conn.commit()
+            get_catalog_cache().bump()
+
+def init_db():
+    with get_conn() as conn:
+        applied = migrate(conn)
+        seed_demo_products(conn)
+    return applied
+
+# Once per process, shared by every session: reruns never touch the schema.
+@st.cache_resource
+def ensure_schema():
+    return init_db()
 
 # ---------------------------
 # Auth helpers
@@ -123,9 +672,12 @@ def register_user(email, password, username=""):
     try:
         run("INSERT INTO users(email,password_hash,username) VALUES(?,?,?)",
             (email, hash_pwd(password), username), commit=True)
-        return True, "Registered successfully."
     except sqlite3.IntegrityError:
         return False, "Email already exists."
+    # Schema setup runs once per process, so the first account may arrive after it
+    with get_conn() as conn:
+        seed_demo_products(conn)
+    return True, "Registered successfully."
 
 def verify_login(email, password):
     u = get_user_by_email(email)
@@ -135,6 +687,12 @@ def verify_login(email, password):
         return True, u
     return False, "Incorrect password."
 
+def get_user_stats(user_id):
+    """{"listings", "cart_items", "orders", "spend"} for one user, from user_stats."""
+    row = run("SELECT listings, cart_items, orders, spend FROM user_stats WHERE user_id=?",
+              (user_id,), fetchone=True)
+    return dict(zip(USER_STATS_COLUMNS, row or (0, 0, 0, 0.0)))
+
 def update_profile(user_id, username=None, email=None, new_password=None):
     if username is not None:
         run("UPDATE users SET username=? WHERE id=?", (username, user_id), commit=True)
@@ -156,43 +714,178 @@ def create_product(user_id, title, description, category, price, image="placehol
     run("""INSERT INTO products(user_id,title,description,category,price,image,created_at)
            VALUES(?,?,?,?,?,?,?)""",
         (user_id,title,description,category,price,image,now), commit=True)
+    get_catalog_cache().bump()
+
+MY_PRODUCTS_SQL = """SELECT id,title,description,category,price,image,created_at
+                     FROM products WHERE user_id=? ORDER BY created_at DESC"""
 
 def get_my_products(user_id):
-    rows = run("""SELECT id,title,description,category,price,image,created_at
-                  FROM products WHERE user_id=? ORDER BY created_at DESC""",
-               (user_id,), fetchall=True)
-    return rows
+    return run(MY_PRODUCTS_SQL, (user_id,), fetchall=True)
+
+def swap_listing_image(old, new):
+    # Each listing holds one reference to a stored photo: take the new one, then drop the old
+    if old == new:
+        return
+    images = get_image_handler()
+    if new and images.is_ref(new):
+        images.retain(new)
+    if old and images.is_ref(old):
+        images.delete_image(old)
 
 def update_product(product_id, user_id, title, description, category, price, image):
-    run("""UPDATE products SET title=?, description=?, category=?, price=?, image=?
-           WHERE id=? AND user_id=?""",
-        (title,description,category,price,image,product_id,user_id), commit=True)
+    with transaction() as conn:
+        old = conn.fetch("SELECT image FROM products WHERE id=? AND user_id=?", (product_id, user_id), one=True)
+        conn.execute("""UPDATE products SET title=?, description=?, category=?, price=?, image=?
+                        WHERE id=? AND user_id=?""",
+                     (title,description,category,price,image,product_id,user_id))
+    get_catalog_cache().bump()
+    if old:
+        swap_listing_image(old[0], image)
 
 def delete_product(product_id, user_id):
-    run("DELETE FROM products WHERE id=? AND user_id=?", (product_id,user_id), commit=True)
+    with transaction() as conn:
+        old = conn.fetch("SELECT image FROM products WHERE id=? AND user_id=?", (product_id, user_id), one=True)
+        conn.execute("DELETE FROM products WHERE id=? AND user_id=?", (product_id,user_id))
+    get_catalog_cache().bump()
+    if old:
+        swap_listing_image(old[0], None)
 
-def get_all_categories():
+def _load_categories():
     rows = run("SELECT name FROM categories ORDER BY name", fetchall=True)
     return [r[0] for r in rows]
 
-def browse_products(category=None, keyword=None, min_price=None, max_price=None, limit=100, offset=0):
-    q = "SELECT id,title,description,category,price,image FROM products WHERE 1=1"
-    params = []
+def get_all_categories():
+    return get_catalog_cache().get(("categories",), _load_categories)
+
+def _load_facets():
+    facets = {}
+    for category, bucket, listings in run("""SELECT category, bucket, listings FROM product_facets
+                                             ORDER BY category, bucket""", fetchall=True):
+        f = facets.setdefault(category, {"listings": 0, "buckets": {}})
+        f["listings"] += listings
+        f["buckets"][bucket] = listings
+    return facets
+
+def get_facets():
+    """{category: {"listings": n, "buckets": {bucket: n}}} from the maintained aggregates."""
+    return get_catalog_cache().get(("facets",), _load_facets)
+
+def price_bucket_bounds(bucket):
+    # (low, high) of a price bucket; high is None for the open-ended last one
+    low = PRICE_BUCKET_EDGES[bucket - 1] if bucket else 0
+    high = PRICE_BUCKET_EDGES[bucket] if bucket < len(PRICE_BUCKET_EDGES) else None
+    return low, high
+
+def price_histogram(category=None):
+    """[(low, high, listings)] for non-empty buckets, for one category or all."""
+    counts = {}
+    for cat, f in get_facets().items():
+        if category is None or cat == category:
+            for bucket, n in f["buckets"].items():
+                counts[bucket] = counts.get(bucket, 0) + n
+    return [(*price_bucket_bounds(b), counts[b]) for b in sorted(counts)]
+
+# Title matches outrank description matches in bm25 scoring
+FTS_WEIGHTS = (10.0, 1.0)
+
+def fts_query(keyword):
+    # Each word becomes a quoted prefix term, so "wood cha" matches "Wooden Chair"
+    terms = re.findall(r"\w+", keyword.lower())
+    return " ".join(f'"{t}"*' for t in terms)
+
+def _browse_sql(category, keyword, min_price, max_price):
+    # Every variant yields (id,title,description,category,price,image,score);
+    # score is the bm25 rank for keyword searches and 0 otherwise.
+    match = fts_query(keyword) if keyword else ""
+    if match:
+        q = """SELECT p.id,p.title,p.description,p.category,p.price,p.image,
+                      bm25(products_fts, ?, ?) AS score
+               FROM products_fts JOIN products p ON p.id=products_fts.rowid
+               WHERE products_fts MATCH ?"""
+        params = [*FTS_WEIGHTS, match]
+    else:
+        q = """SELECT p.id,p.title,p.description,p.category,p.price,p.image, 0 AS score
+               FROM products p WHERE 1=1"""
+        params = []
+        if keyword:
+            # No searchable word (e.g. "!!!"): match nothing rather than the whole catalog
+            q += " AND 0"
     if category:
-        q += " AND category=?"
+        q += " AND p.category=?"
         params.append(category)
-    if keyword:
-        q += " AND LOWER(title) LIKE ?"
-        params.append("%"+keyword.lower()+"%")
     if min_price is not None:
-        q += " AND price>=?"
+        q += " AND p.price>=?"
         params.append(min_price)
     if max_price is not None:
-        q += " AND price<=?"
+        q += " AND p.price<=?"
         params.append(max_price)
-    q += " ORDER BY id DESC LIMIT ? OFFSET ?"
+    return q, params, bool(match)
+
+def browse_products(category=None, keyword=None, min_price=None, max_price=None, limit=100, offset=0):
+    key = ("browse_products", category, keyword, min_price, max_price, limit, offset)
+    return get_catalog_cache().get(key, partial(_load_browse_products, category, keyword,
+                                                min_price, max_price, limit, offset))
+
+def _load_browse_products(category, keyword, min_price, max_price, limit, offset):
+    q, params, ranked = _browse_sql(category, keyword, min_price, max_price)
+    q += " ORDER BY score, p.id DESC" if ranked else " ORDER BY p.id DESC"
+    q += " LIMIT ? OFFSET ?"
     params.extend([limit, offset])
-    return run(q, tuple(params), fetchall=True)
+    return [r[:6] for r in run(q, tuple(params), fetchall=True)]
+
+# Keyset pagination: opaque cursors carry the sort key of the last row shown
+def encode_cursor(*key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(token):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        key = None
+    if not isinstance(key, list) or not key:
+        raise ValueError("Invalid page cursor.")
+    return key
+
+def browse_page_sql(category=None, keyword=None, min_price=None, max_price=None, limit=50, cursor=None):
+    q, params, ranked = _browse_sql(category, keyword, min_price, max_price)
+    key = decode_cursor(cursor) if cursor else None
+    if key is not None and key[0] != ("rank" if ranked else "id"):
+        raise ValueError("Page cursor does not match this search.")
+    if ranked:
+        # Resume after the last (score, id) seen; bm25 sorts best-first ascending
+        q = f"SELECT * FROM ({q}) AS hits"
+        if key:
+            q += " WHERE score>? OR (score=? AND id<?)"
+            params.extend([key[1], key[1], key[2]])
+        q += " ORDER BY score, id DESC"
+    else:
+        if key:
+            q += " AND p.id<?"
+            params.append(key[1])
+        q += " ORDER BY p.id DESC"
+    # One extra row tells us whether a next page exists
+    q += " LIMIT ?"
+    params.append(limit + 1)
+    return q, tuple(params), ranked
+
+def browse_page(category=None, keyword=None, min_price=None, max_price=None, limit=50, cursor=None):
+    """Return (rows, next_cursor); next_cursor is None on the last page."""
+    key = ("browse_page", category, keyword, min_price, max_price, limit, cursor)
+    return get_catalog_cache().get(key, partial(_load_browse_page, category, keyword,
+                                                min_price, max_price, limit, cursor))
+
+def _load_browse_page(category, keyword, min_price, max_price, limit, cursor):
+    q, params, ranked = browse_page_sql(category, keyword, min_price, max_price, limit, cursor)
+    rows = run(q, params, fetchall=True)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor("rank", last[6], last[0]) if ranked else encode_cursor("id", last[0])
+    return [r[:6] for r in rows], next_cursor
+
+def explain(query, params=()):
+    return [r[3] for r in run("EXPLAIN QUERY PLAN " + query, params, fetchall=True)]
 
 def get_product(product_id):
     return run("""SELECT id,user_id,title,description,category,price,image
@@ -202,19 +895,16 @@ def get_product(product_id):
 # Cart + Orders
 # ---------------------------
 def add_to_cart(user_id, product_id, qty=1):
-    existing = run("SELECT id,quantity FROM cart WHERE user_id=? AND product_id=?",
-                   (user_id, product_id), fetchone=True)
-    if existing:
-        new_q = existing[1] + qty
-        run("UPDATE cart SET quantity=? WHERE id=?", (new_q, existing[0]), commit=True)
-    else:
-        run("INSERT INTO cart(user_id,product_id,quantity) VALUES(?,?,?)",
-            (user_id, product_id, qty), commit=True)
+    run("""INSERT INTO cart(user_id,product_id,quantity) VALUES(?,?,?)
+           ON CONFLICT(user_id,product_id) DO UPDATE SET quantity=quantity+excluded.quantity""",
+        (user_id, product_id, qty), commit=True)
+
+VIEW_CART_SQL = """SELECT c.product_id, p.title, p.price, c.quantity
+                   FROM cart c JOIN products p ON c.product_id=p.id
+                   WHERE c.user_id=?"""
 
 def view_cart(user_id):
-    return run("""SELECT c.product_id, p.title, p.price, c.quantity
-                  FROM cart c JOIN products p ON c.product_id=p.id
-                  WHERE c.user_id=?""",(user_id,), fetchall=True)
+    return run(VIEW_CART_SQL, (user_id,), fetchall=True)
 
 def update_cart_qty(user_id, product_id, qty):
     if qty <= 0:
@@ -234,35 +924,204 @@ def cart_total(user_id):
     return sum(row[2]*row[3] for row in items) if items else 0.0
 
 def checkout(user_id):
-    items = view_cart(user_id)
-    if not items:
-        return False, "Cart is empty."
-    now = datetime.utcnow().isoformat()
-    run("INSERT INTO orders(user_id, created_at) VALUES(?,?)",(user_id, now), commit=True)
-    order_id = run("SELECT last_insert_rowid()", fetchone=True)[0]
-    for pid, title, price, qty in items:
-        run("""INSERT INTO order_items(order_id,product_id,title,price,quantity)
-               VALUES(?,?,?,?,?)""",(order_id, pid, title, price, qty), commit=True)
-    clear_cart(user_id)
+    # Cart read, order header, items and cart clear commit together or not at all.
+    with transaction() as conn:
+        items = conn.fetch(VIEW_CART_SQL, (user_id,))
+        if not items:
+            return False, "Cart is empty."
+        now = datetime.utcnow().isoformat()
+        total = sum(price * qty for _, _, price, qty in items)
+        item_count = sum(qty for *_, qty in items)
+        order_id = conn.execute("INSERT INTO orders(user_id, created_at, total, item_count) VALUES(?,?,?,?)",
+                                (user_id, now, total, item_count)).lastrowid
+        conn.executemany("""INSERT INTO order_items(order_id,product_id,title,price,quantity)
+                            VALUES(?,?,?,?,?)""",
+                         [(order_id, pid, title, price, qty) for pid, title, price, qty in items])
+        conn.execute("DELETE FROM cart WHERE user_id=?", (user_id,))
     return True, f"Order #{order_id} placed!"
 
-def previous_purchases(user_id):
-    return run("""SELECT o.id, o.created_at, SUM(oi.price*oi.quantity) as total
-                  FROM orders o
-                  JOIN order_items oi ON o.id=oi.order_id
-                  WHERE o.user_id=?
-                  GROUP BY o.id, o.created_at
-                  ORDER BY o.id DESC""",(user_id,), fetchall=True)
+# One page of a user's orders and all of their items, newest order first
+PURCHASES_PAGE_SQL = """SELECT o.id, o.created_at, o.total, o.item_count, oi.title, oi.price, oi.quantity
+                        FROM (SELECT id, created_at, total, item_count FROM orders
+                              WHERE user_id=? AND id<? ORDER BY id DESC LIMIT ?) AS o
+                        LEFT JOIN order_items oi ON oi.order_id=o.id
+                        ORDER BY o.id DESC, oi.id"""
+
+def purchases_page(user_id, limit=20, cursor=None):
+    """Return (orders, next_cursor); each order is (id, created_at, total, item_count, items)
+    with items as (title, price, quantity). next_cursor is None on the last page."""
+    key = decode_cursor(cursor) if cursor else ["order", 2**63 - 1]
+    if key[0] != "order" or len(key) != 2:
+        raise ValueError("Page cursor does not match this history.")
+    before = key[1]
+    # One extra order tells us whether a next page exists
+    rows = run(PURCHASES_PAGE_SQL, (user_id, before, limit + 1), fetchall=True)
+    orders = {}
+    for oid, created_at, total, item_count, title, price, qty in rows:
+        order = orders.get(oid)
+        if order is None:
+            order = orders[oid] = (oid, created_at, total, item_count, [])
+        if title is not None or qty is not None:
+            order[4].append((title, price, qty))
+    orders = list(orders.values())
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor("order", orders[-1][0])
+    return orders, next_cursor
+
+# ---------------------------
+# Write-behind session cart
+# ---------------------------
+CART_UPSERT_SQL = """INSERT INTO cart(user_id,product_id,quantity) VALUES(?,?,?)
+                     ON CONFLICT(user_id,product_id) DO UPDATE SET quantity=excluded.quantity"""
+# Adds are written as increments, so two sessions adding to one line both count
+CART_ADD_SQL = """INSERT INTO cart(user_id,product_id,quantity) VALUES(?,?,?)
+                  ON CONFLICT(user_id,product_id) DO UPDATE SET quantity=quantity+excluded.quantity"""
+
+class SessionCart:
+    """One session's cart, held in memory and written behind to the cart table.
+
+    Clicks only touch memory. flush() writes every changed line in one
+    transaction, one UPSERT or DELETE per line however many clicks it took.
+    add() is written as an increment and set()/remove() as the absolute
+    quantity, so adds from other sessions of the same user are not lost.
+    A timer flushes CART_FLUSH_SECONDS after the first unflushed change; the
+    UI calls sync() on navigation and checkout() always flushes first.
+    """
+
+    def __init__(self, user_id, pool):
+        self.user_id = user_id
+        self.pool = pool
+        self.flushes = 0
+        self._lock = threading.RLock()
+        self._timer = None
+        self.reload()
+
+    def reload(self):
+        # Drops unflushed changes; callers flush first
+        with self._lock:
+            self._cancel_timer()
+            with self.pool.connection() as conn:
+                rows = conn.fetch("SELECT product_id, quantity FROM cart WHERE user_id=? ORDER BY id",
+                                  (self.user_id,))
+            self.lines = dict(rows)
+            self._dirty = {}        # product_id -> quantity to write, 0 to delete
+            self._added = {}        # product_id -> quantity to add to the stored line
+            self._cleared = False
+
+    def add(self, product_id, qty=1):
+        with self._lock:
+            self.lines[product_id] = self.lines.get(product_id, 0) + qty
+            if product_id in self._dirty:
+                # Already being written as an absolute quantity; keep it absolute
+                self._touch(product_id)
+            else:
+                self._added[product_id] = self._added.get(product_id, 0) + qty
+                self._schedule()
+
+    def set(self, product_id, qty):
+        with self._lock:
+            if qty <= 0:
+                self.lines.pop(product_id, None)
+            else:
+                self.lines[product_id] = qty
+            self._touch(product_id)
+
+    def remove(self, product_id):
+        self.set(product_id, 0)
+
+    def clear(self):
+        with self._lock:
+            self.lines.clear()
+            self._dirty.clear()
+            self._added.clear()
+            self._cleared = True
+            self._schedule()
+
+    def count(self):
+        with self._lock:
+            return sum(self.lines.values())
+
+    def items(self):
+        """(product_id, title, price, quantity) rows, like view_cart()."""
+        with self._lock:
+            lines = list(self.lines.items())
+        if not lines:
+            return []
+        marks = ",".join("?" * len(lines))
+        with self.pool.connection() as conn:
+            found = {pid: (title, price) for pid, title, price in conn.fetch(
+                f"SELECT id,title,price FROM products WHERE id IN ({marks})", [pid for pid, _ in lines])}
+        return [(pid, *found[pid], qty) for pid, qty in lines if pid in found]
+
+    def pending(self):
+        with self._lock:
+            return len(self._dirty) + len(self._added) + self._cleared
+
+    def flush(self):
+        """Write pending changes; returns the number of cart lines written."""
+        with self._lock:
+            self._cancel_timer()
+            if not self._dirty and not self._added and not self._cleared:
+                return 0
+            upserts = [(self.user_id, pid, qty) for pid, qty in self._dirty.items() if qty > 0]
+            deletes = [(self.user_id, pid) for pid, qty in self._dirty.items() if qty <= 0]
+            adds = [(self.user_id, pid, qty) for pid, qty in self._added.items()]
+            with self.pool.connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if self._cleared:
+                    conn.execute("DELETE FROM cart WHERE user_id=?", (self.user_id,))
+                conn.executemany("DELETE FROM cart WHERE user_id=? AND product_id=?", deletes)
+                conn.executemany(CART_UPSERT_SQL, upserts)
+                conn.executemany(CART_ADD_SQL, adds)
+                conn.commit()
+            written = len(self._dirty) + len(self._added)
+            self._dirty.clear()
+            self._added.clear()
+            self._cleared = False
+            self.flushes += 1
+            return written
+
+    def sync(self):
+        """Flush, then re-read the cart so other sessions' changes show up."""
+        with self._lock:
+            self.flush()
+            self.reload()
+
+    def checkout(self):
+        with self._lock:
+            self.flush()
+            result = checkout(self.user_id)
+            self.reload()
+            return result
+
+    def _touch(self, product_id):
+        self._dirty[product_id] = self.lines.get(product_id, 0)
+        self._added.pop(product_id, None)
+        self._schedule()
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = threading.Timer(CART_FLUSH_SECONDS, self._flush_due)
+            self._timer.daemon = True
+            self._timer.start()
 
-def order_details(order_id):
-    return run("""SELECT title, price, quantity FROM order_items
-                  WHERE order_id=?""",(order_id,), fetchall=True)
+    def _flush_due(self):
+        with self._lock:
+            self._timer = None
+            self.flush()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
 
 # ---------------------------
 # Streamlit UI
 # ---------------------------
 st.set_page_config(page_title="Eco-Finds", page_icon="🌱", layout="wide")
-init_db()
+ensure_schema()
 
 if "user" not in st.session_state:
     st.session_state.user = None
@@ -275,6 +1134,8 @@ with col2:
     if st.session_state.user:
         st.write(f"Logged in as **{st.session_state.user['username'] or st.session_state.user['email']}**")
         if st.button("Logout"):
+            if "cart" in st.session_state:
+                st.session_state.pop("cart").flush()
             st.session_state.user = None
             st.rerun()
 
@@ -312,36 +1173,73 @@ def auth_block():
                 else:
                     st.error(msg)
 
+# ---------- Paged browsing ----------
+def paged_browse(state_key, searched, filters, limit):
+    # Filters stick until the next search; cursors form a stack for Previous/Next
+    if searched or state_key not in st.session_state:
+        st.session_state[state_key] = {"filters": filters if searched else {}, "cursors": [None]}
+    state = st.session_state[state_key]
+    rows, next_cursor = browse_page(**state["filters"], limit=limit, cursor=state["cursors"][-1])
+    return rows, next_cursor, state
+
+def category_input(label="Category"):
+    # Categories with their live listing counts, from the facet table
+    facets = get_facets()
+    total = sum(f["listings"] for f in facets.values())
+    cats = ["All"] + get_all_categories()
+    counts = {c: f["listings"] for c, f in facets.items()}
+    cat = st.selectbox(label, cats, format_func=lambda c: f"{c} ({total if c == 'All' else counts.get(c, 0)})")
+    return None if cat == "All" else cat
+
+def price_input(category, label="Price (₹)"):
+    # Slider spans the non-empty price buckets; either end left at its limit means no bound
+    buckets = price_histogram(category)
+    if not buckets:
+        return None, None
+    lo = float(buckets[0][0])
+    hi = float(buckets[-1][1] or buckets[-1][0] * 2)
+    low, high = st.slider(label, min_value=lo, max_value=hi, value=(lo, hi))
+    return (None if low <= lo else low), (None if high >= hi else high)
+
+def price_chart(category):
+    buckets = price_histogram(category)
+    if buckets:
+        st.caption("Listings by price (₹, bucket lower bound)")
+        st.bar_chart([{"from": low, "listings": n} for low, _, n in buckets], x="from", y="listings")
+
+def page_nav(state, next_cursor, key):
+    prev_col, next_col = st.columns(2)
+    with prev_col:
+        if len(state["cursors"]) > 1 and st.button("Previous page", key=f"{key}_prev"):
+            state["cursors"].pop()
+            st.rerun()
+    with next_col:
+        if next_cursor and st.button("Next page", key=f"{key}_next"):
+            state["cursors"].append(next_cursor)
+            st.rerun()
+
 # If not logged in, only show browsing + auth
 if not st.session_state.user:
     left, right = st.columns([2,3])
     with left:
         st.subheader("Browse Listings")
-        cats = ["All"] + get_all_categories()
-        cat = st.selectbox("Category", cats)
-        kw = st.text_input("Keyword (in title)")
-        min_p, max_p = st.columns(2)
-        with min_p:
-            min_price = st.number_input("Min Price", min_value=0.0, value=0.0)
-        with max_p:
-            max_price = st.number_input("Max Price", min_value=0.0, value=100000.0)
+        use_cat = category_input()
+        kw = st.text_input("Keyword (title or description)")
+        min_price, max_price = price_input(use_cat)
         btn = st.button("Search")
 
-        if btn:
-            use_cat = None if cat=="All" else cat
-            rows = browse_products(category=use_cat,
-                                   keyword=kw or None,
-                                   min_price=min_price,
-                                   max_price=max_price)
-        else:
-            rows = browse_products(limit=30)
+        rows, next_cursor, browse_state = paged_browse(
+            "guest_browse", btn,
+            dict(category=use_cat, keyword=kw or None, min_price=min_price, max_price=max_price),
+            limit=30)
 
         for pid, title, desc, ccat, price, image in rows:
             with st.container(border=True):
                 st.write(f"**{title}** — ₹{price} | *{ccat}*")
                 st.caption(desc or "")
-                st.image("https://via.placeholder.com/300x180?text=Image", width=300)
+                st.image(listing_image(image, "card"), width=300)
                 st.write(f"Product ID: {pid}")
+        page_nav(browse_state, next_cursor, "guest_browse")
 
     with right:
         st.subheader("Login / Sign Up")
@@ -349,32 +1247,53 @@ if not st.session_state.user:
     st.stop()
 
 # ---------- Main App (Logged-in) ----------
-page = st.sidebar.radio("Navigate", [
+user = st.session_state.user
+
+pages = [
     "Dashboard",
     "Profile",
     "Browse",
     "My Listings (CRUD)",
     "Cart",
     "Previous Purchases"
-])
+]
+if is_admin(user):
+    pages.append("Query Stats")
+page = st.sidebar.radio("Navigate", pages)
 
-user = st.session_state.user
+def session_cart():
+    cart = st.session_state.get("cart")
+    if cart is None or cart.user_id != user["id"]:
+        if cart is not None:
+            cart.flush()
+        cart = st.session_state.cart = SessionCart(user["id"], get_pool())
+    return cart
+
+cart = session_cart()
+# Leaving a page writes the cart behind it and picks up other sessions' changes
+if st.session_state.get("last_page") != page:
+    cart.sync()
+    st.session_state.last_page = page
+
+if os.environ.get("ECOFINDS_DEBUG"):
+    with st.sidebar.expander("Catalog cache"):
+        st.json(get_catalog_cache().stats())
 
 # Dashboard
 if page == "Dashboard":
     st.subheader("User Dashboard")
     st.info("You can edit all fields in your Profile, manage your Listings, browse products, add to cart, and checkout.")
-    # Quick stats
-    c1, c2, c3 = st.columns(3)
+    # Quick stats: one user_stats row; the cart was flushed on the way to this page
+    stats = get_user_stats(user["id"])
+    c1, c2, c3, c4 = st.columns(4)
     with c1:
-        count_my = run("SELECT COUNT(*) FROM products WHERE user_id=?", (user["id"],), fetchone=True)[0]
-        st.metric("My Listings", count_my)
+        st.metric("My Listings", stats["listings"])
     with c2:
-        cart_items = view_cart(user["id"])
-        st.metric("Cart Items", sum(i[3] for i in cart_items) if cart_items else 0)
+        st.metric("Cart Items", stats["cart_items"])
     with c3:
-        orders_count = run("SELECT COUNT(*) FROM orders WHERE user_id=?", (user["id"],), fetchone=True)[0]
-        st.metric("Orders", orders_count)
+        st.metric("Orders", stats["orders"])
+    with c4:
+        st.metric("Lifetime Spend", f"₹{stats['spend']:.2f}")
 
 # Profile
 elif page == "Profile":
@@ -401,22 +1320,19 @@ elif page == "Profile":
 # Browse (with add to cart + detail)
 elif page == "Browse":
     st.subheader("Browse Listings")
-    cols = st.columns([1,1,1,1])
-    cats = ["All"] + get_all_categories()
+    cols = st.columns([1,1,2])
     with cols[0]:
-        cat = st.selectbox("Category", cats)
+        use_cat = category_input()
     with cols[1]:
-        kw = st.text_input("Keyword in title")
+        kw = st.text_input("Keyword")
     with cols[2]:
-        min_price = st.number_input("Min Price", min_value=0.0, value=0.0)
-    with cols[3]:
-        max_price = st.number_input("Max Price", min_value=0.0, value=100000.0)
-    if st.button("Search"):
-        use_cat = None if cat=="All" else cat
-        rows = browse_products(category=use_cat, keyword=kw or None,
-                               min_price=min_price, max_price=max_price, limit=200)
-    else:
-        rows = browse_products(limit=50)
+        min_price, max_price = price_input(use_cat)
+    with st.sidebar:
+        price_chart(use_cat)
+    rows, next_cursor, browse_state = paged_browse(
+        "browse", st.button("Search"),
+        dict(category=use_cat, keyword=kw or None, min_price=min_price, max_price=max_price),
+        limit=50)
 
     for pid, title, desc, ccat, price, image in rows:
         with st.container(border=True):
@@ -430,12 +1346,13 @@ elif page == "Browse":
                     if p:
                         _, owner_id, t, d, catx, pr, img = p
                         st.info(f"**{t}**\n\n{d or 'No description'}\n\nCategory: *{catx}* | Price: ₹{pr}")
-                        st.image("https://via.placeholder.com/600x300?text=Image", width=500)
+                        st.image(listing_image(img, "detail"), width=500)
             with c2:
                 qty = st.number_input(f"Qty #{pid}", min_value=1, value=1, key=f"qty_{pid}")
                 if st.button(f"Add to Cart #{pid}", key=f"add_{pid}"):
-                    add_to_cart(user["id"], pid, int(qty))
+                    cart.add(pid, int(qty))
                     st.success("Added to cart.")
+    page_nav(browse_state, next_cursor, "browse")
 
 # My Listings (CRUD)
 elif page == "My Listings (CRUD)":
@@ -448,11 +1365,17 @@ elif page == "My Listings (CRUD)":
         category = st.selectbox("Category", cats)
         price = st.number_input("Price (₹)", min_value=0.0, step=10.0)
         image = st.text_input("Image Placeholder (URL or text)", value="placeholder.jpg")
+        photo = st.file_uploader("Photo (optional)", type=["jpg", "jpeg", "png", "webp"])
         submit = st.form_submit_button("Create")
         if submit:
             if not title or price <= 0:
                 st.error("Title and positive price are required.")
             else:
+                if photo is not None:
+                    # Stored once by content; card/detail variants render in the background
+                    image = get_image_handler().save_image(photo, photo.name)
+                else:
+                    swap_listing_image(None, image)
                 create_product(user["id"], title, description, category, price, image)
                 st.success("Listing created!")
 
@@ -483,7 +1406,7 @@ elif page == "My Listings (CRUD)":
 # Cart
 elif page == "Cart":
     st.subheader("Your Cart")
-    items = view_cart(user["id"])
+    items = cart.items()
     if not items:
         st.info("Cart is empty.")
     else:
@@ -498,19 +1421,19 @@ elif page == "Cart":
             with c3:
                 nqty = st.number_input(f"Qty for {title}", min_value=0, value=int(qty), key=f"qty_cart_{pid}")
                 if st.button(f"Update {title}", key=f"upd_{pid}"):
-                    update_cart_qty(user["id"], pid, int(nqty))
+                    cart.set(pid, int(nqty))
                     st.success("Cart updated.")
                     st.rerun()
             with c4:
                 if st.button(f"Remove {title}", key=f"rm_{pid}"):
-                    remove_from_cart(user["id"], pid)
+                    cart.remove(pid)
                     st.warning("Removed.")
                     st.rerun()
         st.markdown(f"### Total: ₹{total:.2f}")
         colA, colB = st.columns(2)
         with colA:
             if st.button("Checkout"):
-                ok, msg = checkout(user["id"])
+                ok, msg = cart.checkout()
                 if ok:
                     st.success(msg)
                     st.rerun()
@@ -518,19 +1441,69 @@ elif page == "Cart":
                     st.error(msg)
         with colB:
             if st.button("Clear Cart"):
-                clear_cart(user["id"])
+                cart.clear()
                 st.warning("Cart cleared.")
                 st.rerun()
 
 # Previous Purchases
 elif page == "Previous Purchases":
     st.subheader("Previous Purchases")
-    orders = previous_purchases(user["id"])
+    # Cursor stack per user, as for browsing; one query per page of orders
+    purchases_state = st.session_state.setdefault(f"purchases_{user['id']}", {"cursors": [None]})
+    orders, next_cursor = purchases_page(user["id"], limit=20, cursor=purchases_state["cursors"][-1])
     if not orders:
         st.info("No previous orders.")
     else:
-        for oid, created_at, total in orders:
-            with st.expander(f"Order #{oid} — ₹{total:.2f} — {created_at}"):
-                items = order_details(oid)
+        for oid, created_at, total, item_count, items in orders:
+            with st.expander(f"Order #{oid} — ₹{total:.2f} — {item_count} items — {created_at}"):
                 for t, price, qty in items:
                     st.write(f"- **{t}** — ₹{price} x {qty} = ₹{price*qty:.2f}")
+        page_nav(purchases_state, next_cursor, "purchases")
+
+# Query Stats (admins only: ECOFINDS_ADMINS)
+elif page == "Query Stats" and is_admin(user):
+    st.subheader("Query Stats")
+    qstats = get_query_stats()
+    queries = qstats.queries()
+    st.caption(f"Every statement on a pooled connection since {qstats.since} UTC, grouped by fingerprint.")
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        st.metric("Statements", sum(q["calls"] for q in queries))
+    with c2:
+        st.metric("Fingerprints", len(queries))
+    with c3:
+        st.metric("Slow", sum(q["slow"] for q in queries))
+    # Only an edit to the widget writes the shared threshold; a plain rerun must
+    # not overwrite a value another admin set.
+    def set_slow_ms():
+        qstats.slow_ms = st.session_state.slow_ms_input
+    st.number_input("Slow-query threshold (ms)", min_value=0.0, value=float(qstats.slow_ms), step=10.0,
+                    key="slow_ms_input", on_change=set_slow_ms)
+    colA, colB = st.columns(2)
+    with colA:
+        st.download_button("Export JSON", json.dumps(qstats.snapshot(), indent=2),
+                           file_name="query_stats.json", mime="application/json")
+    with colB:
+        if st.button("Reset"):
+            qstats.reset()
+            st.rerun()
+
+    st.markdown("#### By fingerprint")
+    st.dataframe([{k: q[k] for k in ("id", "calls", "rows_per_call", "total_ms", "mean_ms",
+                                     "p50_ms", "p95_ms", "p99_ms", "max_ms", "slow", "fingerprint")}
+                  for q in queries], use_container_width=True)
+    if queries:
+        chosen = st.selectbox("Latency histogram", queries,
+                              format_func=lambda q: f"{q['id']} — {q['fingerprint'][:80]}")
+        st.code(chosen["fingerprint"], language="sql")
+        st.bar_chart([{"bucket (ms)": f"<= {b}", "calls": n} for b, n in chosen["histogram"].items()],
+                     x="bucket (ms)", y="calls")
+
+    st.markdown(f"#### Slow-query log (>= {qstats.slow_ms:g} ms)")
+    slow = qstats.slow_log()
+    if not slow:
+        st.info("No slow queries logged.")
+    for entry in reversed(slow):
+        with st.expander(f"{entry['elapsed_ms']:.1f} ms — {entry['rows']} rows — {entry['at']}"):
+            st.code(entry["fingerprint"], language="sql")
+            st.code("\n".join(entry["plan"]), language="text")